@@ -0,0 +1,40 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json
+
+from .renderers import orjson
+
+# orjson читает целые длиннее 64 бит как float, json - как int. Такие
+# тела (и любые с цепочкой из 19 цифр, даже в строке) разбирает json.
+# Цифры заменяются на 0, остальное на пробел: поиск подстроки быстрее
+# регулярного выражения.
+DIGITS = bytes(
+    0x30 if 0x30 <= code <= 0x39 else 0x20 for code in range(256))
+LONG_NUMBER = b'0' * 19
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser на orjson; если orjson не справился или в теле есть
+    целые длиннее 64 бит, разбирает json.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if (
+            orjson is None
+            or not self.strict
+            or encoding.lower().replace('-', '') != 'utf8'
+        ):
+            return super().parse(stream, media_type, parser_context)
+        data = stream.read() if stream is not None else b''
+        if LONG_NUMBER not in data.translate(DIGITS):
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+        try:
+            return json.loads(data.decode(encoding))
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -1,4 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
@@ -7,14 +10,48 @@ from rest_framework.fields import SerializerMethodField
 from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.serializers import ModelSerializer
 
-from backend.constants import MIN_VALUE, MAX_VALUE
+from backend import metrics
+from backend.conditional import make_etag
+from backend.constants import (INGREDIENTS_VERSION_KEY, MAX_VALUE, MIN_VALUE,
+                               RECIPE_FRAGMENT_CACHE_TIMEOUT,
+                               RECIPE_FRAGMENT_KEY, TAGS_VERSION_KEY,
+                               USER_PROFILE_VERSION_KEY)
+from backend.images import variant_urls
+from backend.relations import request_relations
+from backend.versions import get_versions
 from recipes.models import (
-    Ingredient, Recipe, RecipeIngredient, Subscribe, Tag
+    Ingredient, Recipe, RecipeIngredient, ShoppingCartIngredient, Subscribe,
+    Tag, read_prefetches
 )
 
 User = get_user_model()
 
 
+def build_url(request, url):
+    return request.build_absolute_uri(url) if request else url
+
+
+class ImageVariantsField(serializers.Field):
+    """Ссылки на уменьшенные копии и WebP-версии изображения."""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        *path, field = self.image_field.split('.')
+        for attr in path:
+            instance = getattr(instance, attr)
+        urls = variant_urls(
+            getattr(instance, field), getattr(instance, f'{field}_variants'))
+        request = self.context.get('request')
+        return {
+            variant: build_url(request, url) for variant, url in urls.items()
+        }
+
+
 class TagSerializer(ModelSerializer):
     """Сериалайзер тегов."""
 
@@ -85,6 +122,7 @@ class UserAvatarSerializer(serializers.ModelSerializer):
 class UsersSerializer(UserSerializer):
     """Сериалайзер пользователей."""
     is_subscribed = SerializerMethodField()
+    avatar_variants = ImageVariantsField('avatar')
 
     class Meta:
         model = User
@@ -96,15 +134,15 @@ class UsersSerializer(UserSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_variants',
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous or user == obj:
+        request = self.context['request']
+        relations = request_relations(request)
+        if relations is None or request.user == obj:
             return False
-        is_subscribed = Subscribe.objects.filter(
-            user=user, author=obj).exists()
-        return is_subscribed
+        return obj.id in relations.author_ids
 
 
 class UsersCreateSerializer(UserCreateSerializer):
@@ -164,12 +202,65 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
+class RecipeFragmentListSerializer(serializers.ListSerializer):
+    """Список рецептов из кеша сериализованных фрагментов.
+
+    Общая для всех часть рецепта кешируется по id и версиям рецепта,
+    каталогов и профиля автора и читается одним get_many на страницу.
+    Связанные данные из БД догружаются только для промахов, флаги
+    текущего пользователя накладываются при выдаче.
+    """
+
+    def fragment_keys(self, recipes):
+        request = self.context.get('request')
+        base_url = request.build_absolute_uri('/') if request else ''
+        author_ids = sorted({
+            recipe.author_id for recipe in recipes if recipe.author_id})
+        *profiles, ingredients, tags = get_versions(
+            *map(USER_PROFILE_VERSION_KEY.format, author_ids),
+            INGREDIENTS_VERSION_KEY, TAGS_VERSION_KEY,
+        )
+        profiles = dict(zip(author_ids, profiles))
+        return {
+            recipe.id: RECIPE_FRAGMENT_KEY.format(recipe.id, make_etag(
+                recipe.updated_at.timestamp(), ingredients, tags,
+                profiles.get(recipe.author_id), base_url,
+            ))
+            for recipe in recipes
+        }
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        recipes = list(data)
+        keys = self.fragment_keys(recipes)
+        fragments = caches['fragments'].get_many(list(keys.values()))
+        misses = [
+            recipe for recipe in recipes if keys[recipe.id] not in fragments]
+        for recipe in recipes:
+            metrics.record('fragments', keys[recipe.id] in fragments)
+        if misses:
+            prefetch_related_objects(misses, 'author', *read_prefetches())
+            rendered = {
+                keys[recipe.id]: self.child.to_representation(recipe)
+                for recipe in misses
+            }
+            caches['fragments'].set_many(
+                rendered, RECIPE_FRAGMENT_CACHE_TIMEOUT)
+            fragments.update(rendered)
+        return [
+            self.child.overlay_user_flags(fragments[keys[recipe.id]], recipe)
+            for recipe in recipes
+        ]
+
+
 class RecipeReadSerializer(ModelSerializer):
     """READ ONLY сериалайзер рецептов."""
 
     tags = TagSerializer(many=True, read_only=True)
     author = UsersSerializer(read_only=True)
     image = Base64ImageField()
+    image_variants = ImageVariantsField('image')
     ingredients = RecipeIngredientReadSerializer(
         source='ingredient_list', many=True
     )
@@ -187,24 +278,36 @@ class RecipeReadSerializer(ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
-
-    def is_user_anonymous(self):
-        return self.context['request'].user.is_anonymous
+        list_serializer_class = RecipeFragmentListSerializer
+
+    def get_relations(self):
+        return request_relations(self.context['request'])
+
+    def overlay_user_flags(self, data, recipe):
+        """Проставляет в готовые данные рецепта флаги текущего пользователя."""
+        data['is_favorited'] = self.get_is_favorited(recipe)
+        data['is_in_shopping_cart'] = self.get_is_in_shopping_cart(recipe)
+        author = data.get('author')
+        if author:
+            relations = self.get_relations()
+            author['is_subscribed'] = (
+                relations is not None
+                and author['id'] != self.context['request'].user.id
+                and author['id'] in relations.author_ids
+            )
+        return data
 
     def get_is_favorited(self, obj):
-        if self.is_user_anonymous():
-            return False
-        user = self.context['request'].user
-        return user.favorites.filter(recipe=obj).exists()
+        relations = self.get_relations()
+        return relations is not None and obj.id in relations.favorite_ids
 
     def get_is_in_shopping_cart(self, obj):
-        if self.is_user_anonymous():
-            return False
-        user = self.context['request'].user
-        return user.shopping_cart.filter(recipe=obj).exists()
+        relations = self.get_relations()
+        return relations is not None and obj.id in relations.cart_ids
 
 
 class RecipeIngredientWriteSerializer(ModelSerializer):
@@ -289,22 +392,13 @@ class RecipeWriteSerializer(ModelSerializer):
                 {'ingredients': 'Нужен хотя бы один ингредиент!'}
             )
 
-        ingredients_list = []
-
+        ingredient_ids = set()
         for item in ingredients:
             if 'id' not in item['ingredient']:
                 raise ValidationError(
                     {'ingredients': 'Указан некорректный формат ингредиента!'}
                 )
 
-            try:
-                ingredient = Ingredient.objects.get(
-                    id=item['ingredient']['id'])
-            except Ingredient.DoesNotExist:
-                raise ValidationError(
-                    {'ingredients': 'Ингредиент не существует!'}
-                )
-
             amount = item.get('amount')
             if amount is None or amount < MIN_VALUE:
                 raise ValidationError({
@@ -314,12 +408,19 @@ class RecipeWriteSerializer(ModelSerializer):
                     )
                 })
 
-            if ingredient in ingredients_list:
+            ingredient_id = item['ingredient']['id']
+            if ingredient_id in ingredient_ids:
                 raise ValidationError(
                     {'ingredients': 'Ингредиенты не могут повторяться!'}
                 )
+            ingredient_ids.add(ingredient_id)
 
-            ingredients_list.append(ingredient)
+        existing = Ingredient.objects.filter(
+            id__in=ingredient_ids).values_list('id', flat=True)
+        if len(existing) != len(ingredient_ids):
+            raise ValidationError(
+                {'ingredients': 'Ингредиент не существует!'}
+            )
 
         return value
 
@@ -329,17 +430,13 @@ class RecipeWriteSerializer(ModelSerializer):
             raise ValidationError(
                 {'tags': 'Нужно выбрать хотя бы один тег!'}
             )
-        tags_list = []
-        for tag in tags:
-            if tag in tags_list:
-                raise ValidationError(
-                    {'tags': 'Теги должны быть уникальными!'}
-                )
-            tags_list.append(tag)
+        if len({tag.id for tag in tags}) != len(tags):
+            raise ValidationError(
+                {'tags': 'Теги должны быть уникальными!'}
+            )
         return value
 
     def create_ingredients(self, ingredients, recipe):
-        RecipeIngredient.objects.filter(recipe=recipe).delete()
         instances = [
             RecipeIngredient(
                 ingredient_id=ingredient['ingredient']['id'],
@@ -350,6 +447,49 @@ class RecipeWriteSerializer(ModelSerializer):
         ]
         RecipeIngredient.objects.bulk_create(instances)
 
+    def update_ingredients(self, ingredients, recipe):
+        """Приводит ингредиенты рецепта к новому списку.
+
+        Меняются только отличающиеся строки. Возвращает изменения
+        количества по ингредиентам для пересчёта корзин.
+        """
+        current = {
+            item.ingredient_id: item for item in recipe.ingredient_list.all()
+        }
+        amounts = {
+            ingredient['ingredient']['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = [
+            item.id for ingredient_id, item in current.items()
+            if ingredient_id not in amounts
+        ]
+        changed = []
+        added = []
+        deltas = {}
+        for ingredient_id, amount in amounts.items():
+            item = current.get(ingredient_id)
+            if item is None:
+                added.append(RecipeIngredient(
+                    ingredient_id=ingredient_id, recipe=recipe, amount=amount))
+                deltas[ingredient_id] = amount
+            elif item.amount != amount:
+                deltas[ingredient_id] = amount - item.amount
+                item.amount = amount
+                changed.append(item)
+        for ingredient_id, item in current.items():
+            if ingredient_id not in amounts:
+                deltas[ingredient_id] = -item.amount
+
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        return deltas
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredient_list')
         tags_data = validated_data.pop('tags', [])
@@ -359,14 +499,16 @@ class RecipeWriteSerializer(ModelSerializer):
         self.create_ingredients(ingredients_data, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredient_list')
         tags_data = validated_data.pop('tags')
-
         instance = super().update(instance, validated_data)
         instance.tags.set(tags_data)
-        instance.ingredient_list.set([])
-        self.create_ingredients(ingredients_data, instance)
+        deltas = self.update_ingredients(ingredients_data, instance)
+        if deltas:
+            ShoppingCartIngredient.objects.apply_recipe_change(
+                instance, deltas)
         return instance
 
     def to_representation(self, instance):
@@ -386,20 +528,29 @@ class SimpleUserSerializer(serializers.ModelSerializer):
                   'last_name', 'email', 'avatar', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Subscribe.objects.filter(user=request.user,
-                                            author=obj).exists()
-        return False
+        relations = request_relations(self.context.get('request'))
+        return relations is not None and obj.id in relations.author_ids
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
-    """Упрощенный сериалайзер рецептов."""
+    """Упрощенный сериалайзер рецептов.
+
+    Вместо оригинала изображения отдаёт миниатюру, пока она построена.
+    """
+
+    image = SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
+    def get_image(self, obj):
+        if not obj.image:
+            return None
+        url = variant_urls(obj.image, obj.image_variants).get(
+            'thumb', obj.image.url)
+        return build_url(self.context.get('request'), url)
+
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     """Сериалайзер подписок."""
@@ -410,6 +561,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     last_name = serializers.CharField(source='author.last_name')
     email = serializers.EmailField(source='author.email')
     avatar = serializers.ImageField(source='author.avatar', allow_null=True)
+    avatar_variants = ImageVariantsField('author.avatar')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
@@ -418,23 +570,25 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         model = Subscribe
         fields = (
             'id', 'username', 'first_name', 'last_name', 'email',
-            'avatar', 'is_subscribed', 'recipes', 'recipes_count'
+            'avatar', 'avatar_variants', 'is_subscribed', 'recipes',
+            'recipes_count'
         )
 
     def get_is_subscribed(self, instance):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return Subscribe.objects.filter(
-                user=request.user,
-                author=instance.author
-            ).exists()
+            return instance.user_id == request.user.id
         return False
 
     def get_recipes(self, instance):
-        request = self.context.get('request')
-        recipes_limit = int(request.query_params.get('recipes_limit', 5))
-        recipes = instance.author.recipes.all()[:recipes_limit]
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is not None:
+            recipes = recipes_by_author.get(instance.author_id, [])
+        else:
+            request = self.context.get('request')
+            recipes_limit = int(request.query_params.get('recipes_limit', 5))
+            recipes = instance.author.recipes.all()[:recipes_limit]
         return RecipeShortSerializer(recipes, many=True).data
 
     def get_recipes_count(self, instance):
-        return instance.author.recipes.count()
+        return instance.author.recipes_count
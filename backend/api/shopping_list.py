@@ -0,0 +1,157 @@
+import csv
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from backend.constants import (INGREDIENTS_VERSION_KEY,
+                               SHOPPING_LIST_CACHE_TIMEOUT,
+                               SHOPPING_LIST_PDF_TIMEOUT,
+                               SHOPPING_LIST_PDF_WORKERS)
+from backend.versions import get_version
+
+CONTENT_TYPES = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+PDF_FONT = 'ShoppingListFont'
+
+_pdf_executor = ThreadPoolExecutor(
+    max_workers=SHOPPING_LIST_PDF_WORKERS,
+    thread_name_prefix='shopping-list-pdf',
+)
+
+
+def shopping_list_format(request):
+    return request.query_params.get('format') or 'txt'
+
+
+class Echo:
+    """Буфер для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def cart_digest(user, cart):
+    """Хеш содержимого корзины: рецепты, их версии и версия каталога."""
+    digest = hashlib.sha1(f'{user.id}:{user.get_username()}'.encode())
+    for recipe_id, updated_at in sorted(cart):
+        digest.update(f':{recipe_id}@{updated_at.timestamp()}'.encode())
+    digest.update(f':{get_version(INGREDIENTS_VERSION_KEY)}'.encode())
+    return digest.hexdigest()
+
+
+def format_ingredient_line(ingredient):
+    return (
+        f'- {ingredient["ingredient__name"]}'
+        f' ({ingredient["ingredient__measurement_unit"]})'
+        f' - {ingredient["total_amount"]}'
+    )
+
+
+def iter_txt(user, ingredients):
+    yield f'Что купить для {user.get_username()}:\n'
+    separator = ''
+    for ingredient in ingredients:
+        yield separator + format_ingredient_line(ingredient)
+        separator = '\n'
+
+
+def iter_csv(user, ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['Ингредиент', 'Единица измерения', 'Количество'])
+    for ingredient in ingredients:
+        yield writer.writerow([
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['total_amount'],
+        ])
+
+
+def register_pdf_font():
+    if PDF_FONT in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT
+    font_path = settings.SHOPPING_LIST_PDF_FONT
+    if not os.path.exists(font_path):
+        return 'Helvetica'
+    pdfmetrics.registerFont(TTFont(PDF_FONT, font_path))
+    return PDF_FONT
+
+
+def render_pdf(title, lines):
+    buffer = io.BytesIO()
+    font = register_pdf_font()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    margin, step = 50, 18
+    y = height - margin
+    pdf.setFont(font, 16)
+    pdf.drawString(margin, y, title)
+    y -= step * 2
+    pdf.setFont(font, 12)
+    for line in lines:
+        if y < margin:
+            pdf.showPage()
+            pdf.setFont(font, 12)
+            y = height - margin
+        pdf.drawString(margin, y, line)
+        y -= step
+    pdf.save()
+    return buffer.getvalue()
+
+
+def caching_stream(chunks, cache_key):
+    """Отдаёт части файла и кеширует его целиком после выдачи."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(
+        cache_key, ''.join(parts).encode(), SHOPPING_LIST_CACHE_TIMEOUT)
+
+
+def shopping_list_response(user, cart, ingredients, file_format):
+    """Ответ с файлом списка покупок в формате txt, csv или pdf.
+
+    ingredients - агрегированный кверисет, читается через .iterator().
+    Готовый файл кешируется по хешу корзины.
+    """
+    cache_key = (
+        f'shopping_list:{file_format}:{cart_digest(user, cart)}'
+    )
+    content = cache.get(cache_key)
+    if content is not None:
+        response = HttpResponse(
+            content, content_type=CONTENT_TYPES[file_format])
+    elif file_format == 'pdf':
+        title = f'Что купить для {user.get_username()}:'
+        lines = [
+            format_ingredient_line(ingredient)
+            for ingredient in ingredients.iterator()
+        ]
+        content = _pdf_executor.submit(render_pdf, title, lines).result(
+            timeout=SHOPPING_LIST_PDF_TIMEOUT)
+        cache.set(cache_key, content, SHOPPING_LIST_CACHE_TIMEOUT)
+        response = HttpResponse(
+            content, content_type=CONTENT_TYPES[file_format])
+    else:
+        chunks = {'txt': iter_txt, 'csv': iter_csv}[file_format](
+            user, ingredients.iterator())
+        response = StreamingHttpResponse(
+            caching_stream(chunks, cache_key),
+            content_type=CONTENT_TYPES[file_format],
+        )
+    name = f'shopping_list_for_{user.get_username()}.{file_format}'
+    response['Content-Disposition'] = f'attachment; filename="{name}"'
+    return response
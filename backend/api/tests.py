@@ -0,0 +1,196 @@
+import time
+from contextlib import ExitStack
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import DatabaseCache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from backend import db_routing
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Subscribe, Tag)
+from users.models import User
+
+
+@override_settings(RESPONSE_CACHE_TIMEOUTS={})
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Reader', last_name='Test', password='password123')
+        authors = [
+            User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}', first_name='Author',
+                last_name='Test', password='password123')
+            for number in range(3)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag{number}')
+            for number in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)
+        ]
+        for number in range(12):
+            recipe = Recipe.objects.create(
+                author=authors[number % 3], name=f'Рецепт {number}',
+                text='Текст', cooking_time=10, image='recipes/image.png')
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=100)
+                for ingredient in ingredients
+            )
+            if number % 2:
+                FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+            if number % 3:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscribe.objects.create(user=cls.user, author=authors[0])
+        cls.token = Token.objects.create(user=cls.user)
+
+    def assert_list_queries(self, client, expected):
+        for limit in (2, 10):
+            # Холодные фрагменты и связи: худший случай.
+            cache.clear()
+            caches['fragments'].clear()
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(expected):
+                    response = client.get(
+                        '/api/recipes/', {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), limit)
+
+    def test_anonymous_list(self):
+        self.assert_list_queries(APIClient(), 5)
+
+    def test_authenticated_list(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assert_list_queries(client, 9)
+
+
+class CounterDecrementTest(TestCase):
+    """Удаление связей, созданных в обход API, не уводит счётчики ниже 0."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='owner@example.com', username='owner',
+            first_name='Owner', last_name='Test', password='password123')
+        self.follower = User.objects.create_user(
+            email='follower@example.com', username='follower',
+            first_name='Follower', last_name='Test', password='password123')
+        self.recipe = Recipe.objects.create(
+            author=self.user, name='Рецепт', text='Текст', cooking_time=10,
+            image='recipes/image.png')
+        FavoriteRecipe.objects.create(user=self.user, recipe=self.recipe)
+        Subscribe.objects.create(user=self.follower, author=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_delete_favorite(self):
+        response = self.client.delete(
+            f'/api/recipes/{self.recipe.id}/favorite/')
+        self.assertEqual(response.status_code, 204)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+    def test_delete_recipe(self):
+        response = self.client.delete(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.recipes_count, 0)
+
+    def test_unsubscribe(self):
+        client = APIClient()
+        client.force_authenticate(self.follower)
+        response = client.delete(f'/api/users/{self.user.id}/subscribe/')
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.followers_count, 0)
+
+
+@skipUnless(
+    settings.DATABASE_REPLICAS,
+    'Нужны реплики: DB_REPLICAS или алиасы с TEST MIRROR.',
+)
+@override_settings(RESPONSE_CACHE_TIMEOUTS={})
+class ReplicaRoutingTest(TransactionTestCase):
+    """Маршрутизация чтения между основной базой и репликой."""
+
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        db_routing._health.clear()
+        self.replica = settings.DATABASE_REPLICAS[0]
+        self.user = User.objects.create_user(
+            email='writer@example.com', username='writer',
+            first_name='Writer', last_name='Test', password='password123')
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}')
+
+    def queries_by_alias(self, method, url, **kwargs):
+        with ExitStack() as stack:
+            contexts = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias]))
+                for alias in (DEFAULT_DB_ALIAS, self.replica)
+            }
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, {
+            alias: len(context) for alias, context in contexts.items()}
+
+    def test_safe_request_reads_from_replica(self):
+        response, queries = self.queries_by_alias('get', '/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(queries[self.replica], 0)
+
+    def test_catalog_reads_from_primary(self):
+        response, queries = self.queries_by_alias('get', '/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries[self.replica], 0)
+
+    def test_sticky_after_write(self):
+        self.client.post(
+            '/api/users/set_password/',
+            {'current_password': 'password123',
+             'new_password': 'password456'},
+            format='json',
+        )
+        response, queries = self.queries_by_alias('get', '/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries[self.replica], 0)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        db_routing._health[self.replica] = (False, time.monotonic())
+        response, queries = self.queries_by_alias('get', '/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries[self.replica], 0)
+
+    def test_cache_table_and_migrations_use_primary(self):
+        router = db_routing.PrimaryReplicaRouter()
+        token = db_routing._route.set(db_routing.Route(use_replica=True))
+        try:
+            self.assertEqual(
+                router.db_for_read(DatabaseCache(
+                    'cache_table', {}).cache_model_class),
+                DEFAULT_DB_ALIAS,
+            )
+        finally:
+            db_routing._route.reset(token)
+        self.assertFalse(router.allow_migrate(self.replica, 'recipes'))
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'recipes'))
@@ -1,25 +1,39 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
-import pyshorteners
 
-from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Subscribe, Tag)
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
+                            ShoppingCartIngredient, ShortLink, Subscribe, Tag)
+from backend.conditional import (catalog_validators, conditional_get,
+                                 recipe_validators)
+from backend.constants import (INGREDIENTS_VERSION_KEY,
+                               SHORT_LINK_CACHE_TIMEOUT, SHORT_LINK_CODE_KEY,
+                               SHORT_LINK_RECIPE_KEY, TAGS_VERSION_KEY,
+                               USER_RELATIONS_VERSION_KEY)
 from backend.filters import IngredientFilter, RecipeFilter
-from backend.pagination import CustomPagination
+from backend.pagination import CompositeKeysetPagination, CustomPagination
 from backend.permissions import IsAuthorOrReadOnly
+from backend.response_cache import AnonymousCacheMixin
+from backend.versions import bump_version
+from .renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
 from .serializers import (IngredientSerializer, RecipeReadSerializer,
                           RecipeShortSerializer, RecipeWriteSerializer,
                           SubscriptionSerializer, TagSerializer,
                           UsersSerializer, UserAvatarSerializer,
                           UsersCreateSerializer, SetPasswordSerializer)
+from .shopping_list import (CONTENT_TYPES, shopping_list_format,
+                            shopping_list_response)
 
 User = get_user_model()
 
@@ -89,17 +103,33 @@ class UsersViewSet(ModelViewSet):
             )
     def subscriptions(self, request):
         user = request.user
-        subscriptions = Subscribe.objects.filter(user=user)
+        subscriptions = Subscribe.objects.filter(
+            user=user
+        ).select_related('author')
         page = self.paginate_queryset(subscriptions)
         if page is not None:
-            serializer = SubscriptionSerializer(page, many=True,
-                                                context={'request': request})
+            serializer = SubscriptionSerializer(
+                page, many=True,
+                context=self.get_subscriptions_context(request, page)
+            )
             return self.get_paginated_response(serializer.data)
 
-        serializer = SubscriptionSerializer(subscriptions, many=True,
-                                            context={'request': request})
+        subscriptions = list(subscriptions)
+        serializer = SubscriptionSerializer(
+            subscriptions, many=True,
+            context=self.get_subscriptions_context(request, subscriptions)
+        )
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def get_subscriptions_context(self, request, subscriptions):
+        recipes_limit = int(request.query_params.get('recipes_limit', 5))
+        author_ids = [subscription.author_id for subscription in subscriptions]
+        return {
+            'request': request,
+            'recipes_by_author': Recipe.objects.latest_by_author(
+                author_ids, recipes_limit),
+        }
+
     @action(detail=True,
             methods=['post', 'delete'],
             permission_classes=[IsAuthenticated]
@@ -131,8 +161,12 @@ class UsersViewSet(ModelViewSet):
                 return Response(serializer.data,
                                 status=status.HTTP_400_BAD_REQUEST)
 
-            subscription = Subscribe(user=user, author=author)
-            subscription.save()
+            with transaction.atomic():
+                subscription = Subscribe(user=user, author=author)
+                subscription.save()
+                User.objects.filter(pk=author.pk).update(
+                    followers_count=F('followers_count') + 1)
+            bump_version(USER_RELATIONS_VERSION_KEY.format(user.id))
 
             serializer = SubscriptionSerializer(
                 subscription,
@@ -146,7 +180,11 @@ class UsersViewSet(ModelViewSet):
             user=user, author=author).first()
 
         if subscription:
-            subscription.delete()
+            with transaction.atomic():
+                subscription.delete()
+                User.objects.filter(pk=author.pk).update(
+                    followers_count=Greatest(F('followers_count') - 1, 0))
+            bump_version(USER_RELATIONS_VERSION_KEY.format(user.id))
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(
@@ -165,7 +203,7 @@ class UsersViewSet(ModelViewSet):
         return Response(serializer.data)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(AnonymousCacheMixin, ModelViewSet):
     """Вьюсет операций с рецептами."""
 
     queryset = Recipe.objects.all()
@@ -173,6 +211,19 @@ class RecipeViewSet(ModelViewSet):
     pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    response_cache_name = 'recipes'
+    counter_fields = {
+        FavoriteRecipe: 'favorites_count',
+        ShoppingCart: 'in_carts_count',
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.for_list()
+        elif self.request.method in SAFE_METHODS:
+            queryset = queryset.for_read()
+        return queryset
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -184,16 +235,67 @@ class RecipeViewSet(ModelViewSet):
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= списка покупок совпадает с URL_FORMAT_OVERRIDE DRF:
+        # неизвестный формат отдаём в download_shopping_cart для ответа
+        # 400, а не 404 от согласования.
+        if self.action == 'download_shopping_cart' and (
+                shopping_list_format(request) not in CONTENT_TYPES):
+            renderer = self.get_renderers()[0]
+            return renderer, renderer.media_type
+        return super().perform_content_negotiation(request, force)
+
+    @conditional_get(recipe_validators)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        recipe = serializer.save()
+        User.objects.filter(pk=recipe.author_id).update(
+            recipes_count=F('recipes_count') + 1)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        ShoppingCartIngredient.objects.apply_recipe_change(instance, {
+            ingredient_id: -amount
+            for ingredient_id, amount in instance.ingredient_list.values_list(
+                'ingredient_id', 'amount')
+        })
+        instance.delete()
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=Greatest(F('recipes_count') - 1, 0))
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+        pagination_class=CompositeKeysetPagination,
+    )
+    def feed(self, request):
+        """Лента рецептов авторов из подписок пользователя."""
+        queryset = Recipe.objects.feed(request.user).for_list()
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=True,
         methods=['get'],
         url_path='get-link',
     )
     def get_link(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        recipe_url = request.build_absolute_uri(f"/recipes/{recipe.id}/")
-        s = pyshorteners.Shortener()
-        short_link = s.tinyurl.short(recipe_url)
+        cache_key = SHORT_LINK_RECIPE_KEY.format(pk)
+        code = cache.get(cache_key)
+        if code is None:
+            recipe = get_object_or_404(Recipe, pk=pk)
+            code = ShortLink.objects.get_or_create(
+                recipe=recipe,
+                defaults={'code': ShortLink.code_for(recipe.id)}
+            )[0].code
+            cache.set(cache_key, code, SHORT_LINK_CACHE_TIMEOUT)
+        short_link = request.build_absolute_uri(
+            reverse('short-link', args=[code]))
         return Response({'short-link': short_link}, status=status.HTTP_200_OK)
 
     @action(
@@ -235,7 +337,15 @@ class RecipeViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        model.objects.create(user=user, recipe=recipe_or_response)
+        counter = self.counter_fields[model]
+        with transaction.atomic():
+            model.objects.create(user=user, recipe=recipe_or_response)
+            Recipe.objects.filter(pk=recipe_or_response.pk).update(
+                **{counter: F(counter) + 1})
+            if model is ShoppingCart:
+                ShoppingCartIngredient.objects.add_recipe(
+                    user, recipe_or_response)
+        bump_version(USER_RELATIONS_VERSION_KEY.format(user.id))
         serializer = RecipeShortSerializer(recipe_or_response)
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -250,68 +360,97 @@ class RecipeViewSet(ModelViewSet):
         if not obj:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        obj.delete()
+        counter = self.counter_fields[model]
+        with transaction.atomic():
+            obj.delete()
+            Recipe.objects.filter(pk=recipe_or_response.pk).update(
+                **{counter: Greatest(F(counter) - 1, 0)})
+            if model is ShoppingCart:
+                ShoppingCartIngredient.objects.remove_recipe(
+                    user, recipe_or_response)
+        bump_version(USER_RELATIONS_VERSION_KEY.format(user.id))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def get_user_shopping_cart_ingredients(self, user):
-        return RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=user
-        )
-
-    def aggregate_ingredient_amount(self, ingredients):
-        return ingredients.values(
+        return ShoppingCartIngredient.objects.filter(user=user).values(
             'ingredient__name', 'ingredient__measurement_unit',
-        ).annotate(total_amount=Sum('amount')).order_by('ingredient__name')
-
-    def format_ingredient_line(self, ingredient):
-        return (
-            f'- {ingredient["ingredient__name"]}'
-            f' ({ingredient["ingredient__measurement_unit"]})'
-            f' - {ingredient["total_amount"]}'
-        )
+            'total_amount',
+        ).order_by('ingredient__name')
 
     @action(
         detail=False,
         methods=['get'],
         url_path='download_shopping_cart',
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[
+            *api_settings.DEFAULT_RENDERER_CLASSES,
+            PlainTextRenderer, CSVRenderer, PDFRenderer,
+        ]
     )
     def download_shopping_cart(self, request):
         user = request.user
+        file_format = shopping_list_format(request)
 
-        if not user.shopping_cart.exists():
+        if file_format not in CONTENT_TYPES:
+            return Response(
+                {'error': 'Доступные форматы: {}.'.format(
+                    ', '.join(CONTENT_TYPES))},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cart = list(user.shopping_cart.values_list(
+            'recipe_id', 'recipe__updated_at'))
+        if not cart:
             return Response(
                 {'error': 'Корзина покупок пуста.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
         user_ingredients = self.get_user_shopping_cart_ingredients(user)
-        agg_ing = self.aggregate_ingredient_amount(user_ingredients)
-        name = f'shopping_list_for_{user.get_username()}.txt'
-        shopping_list = f'Что купить для {user.get_username()}:\n'
-        shopping_list += '\n'.join(
-            [self.format_ingredient_line(ingredient) for ingredient in agg_ing]
-        )
-
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename="{name}"'
+        return shopping_list_response(
+            user, cart, user_ingredients, file_format)
 
-        return response
 
-
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(AnonymousCacheMixin, ReadOnlyModelViewSet):
     """Вьюсет для ингредиентов."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
-    search_fields = ['^name', ]
     filter_backends = [IngredientFilter, ]
+    response_cache_name = 'ingredients'
+
+    @conditional_get(catalog_validators(INGREDIENTS_VERSION_KEY))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
+    @conditional_get(catalog_validators(INGREDIENTS_VERSION_KEY))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
-class TagViewSet(ReadOnlyModelViewSet):
+
+class TagViewSet(AnonymousCacheMixin, ReadOnlyModelViewSet):
     """Вьюсет для тегов."""
     queryset = Tag.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = TagSerializer
     pagination_class = None
+    response_cache_name = 'tags'
+
+    @conditional_get(catalog_validators(TAGS_VERSION_KEY))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(catalog_validators(TAGS_VERSION_KEY))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+def short_link_redirect(request, code):
+    """Переход по короткой ссылке на страницу рецепта."""
+    cache_key = SHORT_LINK_CODE_KEY.format(code)
+    recipe_id = cache.get(cache_key)
+    if recipe_id is None:
+        recipe_id = get_object_or_404(ShortLink, code=code).recipe_id
+        cache.set(cache_key, recipe_id, SHORT_LINK_CACHE_TIMEOUT)
+    return redirect(f'/recipes/{recipe_id}/')
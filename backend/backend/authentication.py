@@ -0,0 +1,48 @@
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from backend import metrics
+from backend.constants import AUTH_TOKEN_CACHE_TIMEOUT, AUTH_TOKEN_KEY
+
+
+def token_cache_key(key):
+    # Сам токен в ключ кеша не попадает.
+    return AUTH_TOKEN_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def forget_tokens(*keys):
+    """Удаляет токены из кеша после коммита текущей транзакции.
+
+    До коммита параллельный запрос мог бы снова закешировать старую
+    запись из базы.
+    """
+    cache_keys = [token_cache_key(key) for key in keys]
+    if cache_keys:
+        transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
+def forget_user_tokens(user_id):
+    forget_tokens(*Token.objects.filter(
+        user_id=user_id).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, который хранит токен с пользователем в кеше.
+
+    Запись живёт AUTH_TOKEN_CACHE_TIMEOUT секунд и удаляется сигналами
+    при выходе, смене пароля и любом изменении пользователя.
+    """
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        metrics.record('auth', token is not None)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token, AUTH_TOKEN_CACHE_TIMEOUT)
+            return user, token
+        return token.user, token
@@ -0,0 +1,95 @@
+import hashlib
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from backend.constants import (INGREDIENTS_VERSION_KEY, TAGS_VERSION_KEY,
+                               USER_PROFILE_VERSION_KEY,
+                               USER_RELATIONS_VERSION_KEY)
+from backend.versions import get_version, get_versions
+
+NANOSECONDS = 10 ** 9
+
+
+def make_etag(*parts):
+    return hashlib.sha1(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def conditional_get(validators):
+    """Декоратор метода вьюсета: 304 по ETag/Last-Modified до сериализации.
+
+    validators(view, request, *args, **kwargs) возвращает пару
+    (etag, last_modified) или None, если проверить версию нельзя.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            validated = validators(view, request, *args, **kwargs)
+            if validated is None:
+                return method(view, request, *args, **kwargs)
+            etag, last_modified = validated
+            etag = quote_etag(etag)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.setdefault('ETag', etag)
+                if last_modified:
+                    response.setdefault(
+                        'Last-Modified', http_date(last_modified))
+            patch_vary_headers(response, ('Authorization',))
+            return response
+        return wrapper
+    return decorator
+
+
+def catalog_validators(version_key):
+    """Валидаторы справочника: версия каталога и формат ответа."""
+    def validators(view, request, *args, **kwargs):
+        version = get_version(version_key)
+        etag = make_etag(version_key, version, request.accepted_media_type)
+        return etag, version // NANOSECONDS
+    return validators
+
+
+def recipe_validators(view, request, *args, **kwargs):
+    """Валидаторы рецепта.
+
+    Общая часть ETag зависит от updated_at рецепта, версий справочников
+    и профиля автора. Флаги текущего пользователя добавляются отдельной
+    частью, поэтому Last-Modified отдаётся только анонимам.
+    """
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    lookup = {view.lookup_field: kwargs[lookup_url_kwarg]}
+    try:
+        row = view.queryset.filter(**lookup).values_list(
+            'updated_at', 'author_id').first()
+    except (TypeError, ValueError, ValidationError):
+        # Как в get_object_or_404 DRF: некорректный id даёт 404 во вьюсете.
+        row = None
+    if row is None:
+        return None
+    updated_at, author_id = row
+    versions = get_versions(
+        INGREDIENTS_VERSION_KEY,
+        TAGS_VERSION_KEY,
+        USER_PROFILE_VERSION_KEY.format(author_id),
+    )
+    etag = make_etag(
+        'recipe', lookup, updated_at.timestamp(), *versions,
+        request.accepted_media_type,
+    )
+    user = request.user
+    if user.is_authenticated:
+        relations = get_version(USER_RELATIONS_VERSION_KEY.format(user.id))
+        return f'{etag}.{make_etag(user.id, relations)}', None
+    last_modified = max(
+        int(updated_at.timestamp()),
+        *(version // NANOSECONDS for version in versions),
+    )
+    return etag, last_modified
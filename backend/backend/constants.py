@@ -1,3 +1,72 @@
 MIN_VALUE = 1
 
 MAX_VALUE = 1500
+
+INGREDIENTS_VERSION_KEY = 'catalog:ingredients:version'
+
+TAGS_VERSION_KEY = 'catalog:tags:version'
+
+USER_PROFILE_VERSION_KEY = 'user:{}:profile:version'
+
+USER_RELATIONS_VERSION_KEY = 'user:{}:relations:version'
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60
+
+SHOPPING_LIST_PDF_WORKERS = 2
+
+SHOPPING_LIST_PDF_TIMEOUT = 30
+
+SHORT_LINK_CACHE_TIMEOUT = 60 * 60 * 24
+
+SHORT_LINK_RECIPE_KEY = 'short_link:recipe:{}'
+
+SHORT_LINK_CODE_KEY = 'short_link:code:{}'
+
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+IMAGE_VARIANT_SIZES = {
+    'thumb': (300, 300),
+    'medium': (800, 800),
+}
+
+IMAGE_VARIANT_QUALITY = 85
+
+IMAGE_VARIANT_WEBP_QUALITY = 80
+
+JOB_MAX_ATTEMPTS = 5
+
+JOB_RETRY_DELAY = 10
+
+JOB_RETRY_MAX_DELAY = 60 * 60
+
+JOB_LOCK_TIMEOUT = 10 * 60
+
+JOB_POLL_INTERVAL = 1
+
+SEARCH_CONFIG = 'russian'
+
+USER_RELATIONS_KEY = 'user:{}:relations:{}'
+
+USER_RELATIONS_CACHE_TIMEOUT = 60 * 60 * 24
+
+METRICS_KEY = 'metrics:{}'
+
+METRICS_NAMES_KEY = 'metrics:names'
+
+METRICS_FLUSH_INTERVAL = 10
+
+RESPONSE_CACHE_GENERATION_KEY = 'responses:generation'
+
+RESPONSE_CACHE_KEY = 'responses:{}:{}:{}'
+
+RECIPE_FRAGMENT_KEY = 'recipe:{}:fragment:{}'
+
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+AUTH_TOKEN_KEY = 'auth:token:{}'
+
+AUTH_TOKEN_CACHE_TIMEOUT = 60
+
+DB_STICKY_KEY = 'db:sticky:{}'
+
+DB_REPLICA_HEALTH_INTERVAL = 10
@@ -0,0 +1,166 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from backend.constants import DB_REPLICA_HEALTH_INTERVAL, DB_STICKY_KEY
+
+logger = logging.getLogger(__name__)
+
+_route = ContextVar('db_route', default=None)
+_health = {}
+_health_lock = threading.Lock()
+
+
+class Route:
+    """Куда читает текущий запрос: реплика выбирается при первом чтении."""
+    __slots__ = ('use_replica', 'replica', 'wrote')
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.replica = None
+        self.wrote = False
+
+
+def replica_is_healthy(alias):
+    """Доступна ли реплика; результат проверки живёт
+    DB_REPLICA_HEALTH_INTERVAL секунд в памяти процесса.
+    """
+    now = time.monotonic()
+    with _health_lock:
+        healthy, checked_at = _health.get(alias, (True, None))
+        if checked_at is not None and (
+                now - checked_at < DB_REPLICA_HEALTH_INTERVAL):
+            return healthy
+        _health[alias] = (healthy, now)
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        healthy = True
+    except Exception:
+        # Кроме DatabaseError, неверные OPTIONS дают TypeError при connect.
+        logger.warning('Реплика %s недоступна', alias, exc_info=True)
+        connections[alias].close()
+        healthy = False
+    with _health_lock:
+        _health[alias] = (healthy, time.monotonic())
+    return healthy
+
+
+def choose_replica():
+    replicas = [
+        alias for alias in settings.DATABASE_REPLICAS
+        if replica_is_healthy(alias)
+    ]
+    return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+
+class PrimaryReplicaRouter:
+    """Читает с реплики, если ReplicaRoutingMiddleware разрешил это
+    запросу; всё остальное, включая миграции, идёт в основную базу.
+
+    Некоторые модели всегда читаются из основной базы:
+    - токены и сессии: выданный при входе токен может ещё не дойти до
+      реплики;
+    - таблица DatabaseCache: версии и прочие ключи кеша;
+    - справочники (ингредиенты, теги): их версии меняются после коммита
+      в основной базе, и индекс в памяти и ETag не должны собираться из
+      отстающей реплики под новой версией.
+    Запись в эти таблицы не делает клиента "липким".
+
+    Остальные кеши ответов и фрагментов могут на время TTL сохранить
+    данные отставшей реплики, поэтому отставание должно быть много
+    меньше RESPONSE_CACHE_TIMEOUTS['recipes'].
+    """
+    primary_apps = frozenset(('authtoken', 'sessions', 'django_cache'))
+    primary_models = frozenset(('recipes.ingredient', 'recipes.tag'))
+
+    def is_primary_only(self, model):
+        opts = model._meta
+        return (
+            opts.app_label in self.primary_apps
+            or opts.label_lower in self.primary_models
+        )
+
+    def db_for_read(self, model, **hints):
+        route = _route.get()
+        if route is None or not route.use_replica:
+            return None
+        if self.is_primary_only(model):
+            return DEFAULT_DB_ALIAS
+        if route.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if route.replica is None:
+            route.replica = choose_replica()
+        return route.replica
+
+    def db_for_write(self, model, **hints):
+        route = _route.get()
+        if route is not None and not self.is_primary_only(model):
+            route.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def sticky_keys(request, response=None):
+    """Ключи "липкости" клиента: по заголовку Authorization и по cookie
+    сессии, включая новую cookie из ответа (вход меняет ключ сессии).
+    """
+    values = [
+        request.META.get('HTTP_AUTHORIZATION'),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME),
+    ]
+    if response is not None:
+        cookie = response.cookies.get(settings.SESSION_COOKIE_NAME)
+        if cookie is not None:
+            values.append(cookie.value)
+    return [
+        DB_STICKY_KEY.format(hashlib.sha256(value.encode()).hexdigest())
+        for value in values if value
+    ]
+
+
+class ReplicaRoutingMiddleware:
+    """Отправляет безопасные запросы на реплики.
+
+    После записи клиент с тем же заголовком Authorization или той же
+    сессией DATABASE_STICKY_SECONDS секунд читает из основной базы и
+    видит свои изменения, даже если реплика отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        keys = sticky_keys(request)
+        use_replica = request.method in SAFE_METHODS and not (
+            keys and cache.get_many(keys))
+        route = Route(use_replica)
+        token = _route.set(route)
+        try:
+            response = self.get_response(request)
+        finally:
+            _route.reset(token)
+        if route.wrote or request.method not in SAFE_METHODS:
+            keys = sticky_keys(request, response)
+            if keys:
+                cache.set_many(
+                    dict.fromkeys(keys, True),
+                    settings.DATABASE_STICKY_SECONDS,
+                )
+        return response
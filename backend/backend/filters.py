@@ -1,25 +1,49 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
-from recipes.models import Recipe, Tag
+from backend.ingredient_index import get_ingredient_index
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, Tag
 
 User = get_user_model()
 
 
-class IngredientFilter(SearchFilter):
+class IngredientFilter(BaseFilterBackend):
+    """Поиск ингредиентов по индексу названий в памяти процесса.
+
+    Индекс отдаёт список, поэтому используется только для list; в
+    остальных действиях (get_object) фильтр остаётся QuerySet.
+    """
     search_param = 'name'
 
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+        if getattr(view, 'action', None) != 'list':
+            return queryset.filter(name__istartswith=term)
+        return get_ingredient_index().search(term)
+
 
 class RecipeFilter(FilterSet):
+    """Фильтры рецептов полусоединениями EXISTS, без DISTINCT.
+
+    Подзапросы по избранному и корзине идут по индексам уникальных
+    ограничений (user_id, recipe_id), по тегам - (recipe_id, tag_id).
+    ?search= - полнотекстовый поиск, см. RecipeQuerySet.search.
+    """
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
     )
 
+    search = filters.CharFilter(method='filter_search')
+
     is_in_purchase = filters.BooleanFilter(
-        method='filter_is_in_purchase'
+        method='filter_is_in_shopping_cart'
     )
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited'
@@ -30,23 +54,33 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_in_purchase',
+        fields = ('tags', 'author', 'search', 'is_in_purchase',
                   'is_favorited', 'is_in_shopping_cart')
 
     def is_user_anonymous(self):
         return self.request.user.is_anonymous
 
-    def filter_is_in_purchase(self, queryset, name, value):
-        if value and not self.is_user_anonymous():
-            return queryset.filter(purchase__user=self.request.user)
-        return queryset
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value)))
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return queryset.search(value)
+
+    def filter_by_user_relation(self, queryset, model, value):
+        if value is None or self.is_user_anonymous():
+            return queryset
+        related = Exists(model.objects.filter(
+            user=self.request.user, recipe=OuterRef('pk')))
+        return queryset.filter(related if value else ~related)
 
     def filter_is_favorited(self, queryset, name, value):
-        if value and not self.is_user_anonymous():
-            return queryset.filter(favorites__user=self.request.user)
-        return queryset
+        return self.filter_by_user_relation(queryset, FavoriteRecipe, value)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        if value and not self.is_user_anonymous():
-            return queryset.filter(shopping_cart__isnull=False)
-        return queryset.filter(shopping_cart__isnull=True)
+        return self.filter_by_user_relation(queryset, ShoppingCart, value)
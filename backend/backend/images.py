@@ -0,0 +1,133 @@
+import io
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from backend.authentication import forget_user_tokens
+from backend.constants import (IMAGE_VARIANT_QUALITY, IMAGE_VARIANT_SIZES,
+                               IMAGE_VARIANT_WEBP_QUALITY,
+                               USER_PROFILE_VERSION_KEY)
+from backend.response_cache import bump_response_generation
+from backend.versions import bump_version
+from jobs.queue import task
+
+
+def variant_path(name, variant, extension):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(
+        directory, 'variants', f'{stem}_{variant}.{extension}')
+
+
+def save_image(image, path, image_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    return default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info)
+
+
+def build_variants(name):
+    """Создаёт уменьшенные копии изображения и их WebP-версии.
+
+    Возвращает словарь вариант -> путь в хранилище; в ключе source
+    лежит имя исходного файла.
+    """
+    largest = max(IMAGE_VARIANT_SIZES.values())
+    with default_storage.open(name) as file, Image.open(file) as source:
+        # JPEG сразу декодируется в уменьшенном масштабе.
+        source.draft('RGB', largest)
+        image = ImageOps.exif_transpose(source)
+    if has_alpha(image):
+        image = image.convert('RGBA')
+        extension, image_format, options = 'png', 'PNG', {'optimize': True}
+    else:
+        image = image.convert('RGB')
+        extension, image_format, options = 'jpg', 'JPEG', {
+            'quality': IMAGE_VARIANT_QUALITY, 'optimize': True,
+            'progressive': True,
+        }
+
+    variants = {'source': name}
+    sizes = sorted(
+        IMAGE_VARIANT_SIZES.items(), key=lambda item: item[1], reverse=True)
+    for variant, size in sizes:
+        image = image.copy()
+        image.thumbnail(size, Image.LANCZOS)
+        variants[variant] = save_image(
+            image, variant_path(name, variant, extension),
+            image_format, **options)
+        variants[f'{variant}_webp'] = save_image(
+            image, variant_path(name, variant, 'webp'),
+            'WEBP', quality=IMAGE_VARIANT_WEBP_QUALITY, method=4)
+    return variants
+
+
+def delete_variants(variants, keep=()):
+    for variant, path in variants.items():
+        if variant != 'source' and path not in keep:
+            default_storage.delete(path)
+
+
+def needs_variants(file, variants):
+    """Варианты устарели: файл сменился или удалён."""
+    if not file:
+        return bool(variants)
+    return variants.get('source') != file.name
+
+
+def variant_urls(file, variants):
+    """Ссылки на варианты, если они построены для текущего файла."""
+    if not file or variants.get('source') != file.name:
+        return {}
+    return {
+        variant: default_storage.url(path)
+        for variant, path in variants.items()
+        if variant != 'source'
+    }
+
+
+def refresh_variants(model, pk, field, name, **extra):
+    """Перестраивает варианты файла name у объекта pk.
+
+    Ничего не делает, если файл объекта за это время сменился.
+    Поля extra обновляются вместе с вариантами.
+    """
+    variants_field = f'{field}_variants'
+    current = model.objects.filter(pk=pk, **{field: name})
+    old = current.values_list(variants_field, flat=True).first()
+    if old is None:
+        return False
+    variants = build_variants(name) if name else {}
+    if not current.update(**{variants_field: variants}, **extra):
+        delete_variants(variants)
+        return False
+    delete_variants(old, keep=set(variants.values()))
+    return True
+
+
+@task
+def process_recipe_image(recipe_id, name):
+    from recipes.models import Recipe
+
+    if refresh_variants(
+            Recipe, recipe_id, 'image', name, updated_at=timezone.now()):
+        bump_response_generation()
+
+
+@task
+def process_avatar(user_id, name):
+    from users.models import User
+
+    if refresh_variants(User, user_id, 'avatar', name):
+        bump_version(USER_PROFILE_VERSION_KEY.format(user_id))
+        bump_response_generation()
+        forget_user_tokens(user_id)
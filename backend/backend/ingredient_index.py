@@ -0,0 +1,64 @@
+import threading
+from array import array
+from bisect import bisect_left
+
+from backend.constants import INGREDIENTS_VERSION_KEY
+from backend.versions import get_version
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Отсортированный индекс названий ингредиентов для поиска по префиксу."""
+
+    __slots__ = ('version', 'keys', 'ids', 'names', 'units')
+
+    def __init__(self, version, rows):
+        rows = sorted(rows, key=lambda row: (row[1].casefold(), row[0]))
+        self.version = version
+        self.keys = [name.casefold() for _, name, _ in rows]
+        self.ids = array('q', (pk for pk, _, _ in rows))
+        self.names = [name for _, name, _ in rows]
+        self.units = [unit for _, _, unit in rows]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, term):
+        """Сначала совпадения по префиксу, затем по подстроке."""
+        term = term.casefold()
+        start = bisect_left(self.keys, term)
+        end = start
+        while end < len(self.keys) and self.keys[end].startswith(term):
+            end += 1
+        positions = list(range(start, end))
+        positions.extend(
+            position for position, key in enumerate(self.keys)
+            if term in key and not start <= position < end
+        )
+        return [self.get(position) for position in positions]
+
+    def get(self, position):
+        return Ingredient(
+            id=self.ids[position],
+            name=self.names[position],
+            measurement_unit=self.units[position],
+        )
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_ingredient_index():
+    """Индекс процесса, перестраивается при смене версии каталога."""
+    global _index
+    version = get_version(INGREDIENTS_VERSION_KEY)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+    with _lock:
+        if _index is None or _index.version != version:
+            rows = Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit')
+            _index = IngredientIndex(version, rows)
+        return _index
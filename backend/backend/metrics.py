@@ -0,0 +1,77 @@
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+from backend.constants import (METRICS_FLUSH_INTERVAL, METRICS_KEY,
+                               METRICS_NAMES_KEY)
+
+_lock = threading.Lock()
+_pending = Counter()
+_flushed_at = time.monotonic()
+
+
+def record(name, hit):
+    """Учитывает попадание или промах кеша name.
+
+    Счётчики копятся в памяти процесса и раз в METRICS_FLUSH_INTERVAL
+    секунд переносятся в общий кеш, чтобы не писать в него на каждый
+    запрос.
+    """
+    global _flushed_at
+    with _lock:
+        _pending[(name, 'hit' if hit else 'miss')] += 1
+        if time.monotonic() - _flushed_at < METRICS_FLUSH_INTERVAL:
+            return
+        pending = _pending.copy()
+        _pending.clear()
+        _flushed_at = time.monotonic()
+    flush(pending)
+
+
+def flush(pending=None):
+    """Переносит накопленные счётчики в общий кеш."""
+    if pending is None:
+        with _lock:
+            pending = _pending.copy()
+            _pending.clear()
+    if not pending:
+        return
+    names = cache.get(METRICS_NAMES_KEY, set())
+    new_names = {name for name, _ in pending} - names
+    if new_names:
+        cache.set(METRICS_NAMES_KEY, names | new_names, None)
+    for (name, outcome), count in pending.items():
+        key = METRICS_KEY.format(f'{name}:{outcome}')
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            if not cache.add(key, count, None):
+                cache.incr(key, count)
+
+
+def get_stats():
+    """Попадания и промахи по всем кешам: {name: (hits, misses)}."""
+    names = sorted(cache.get(METRICS_NAMES_KEY, set()))
+    keys = {
+        name: (
+            METRICS_KEY.format(f'{name}:hit'),
+            METRICS_KEY.format(f'{name}:miss'),
+        )
+        for name in names
+    }
+    values = cache.get_many([key for pair in keys.values() for key in pair])
+    return {
+        name: (values.get(hit_key, 0), values.get(miss_key, 0))
+        for name, (hit_key, miss_key) in keys.items()
+    }
+
+
+def reset_stats():
+    names = cache.get(METRICS_NAMES_KEY, set())
+    cache.delete_many([
+        METRICS_KEY.format(f'{name}:{outcome}')
+        for name in names
+        for outcome in ('hit', 'miss')
+    ] + [METRICS_NAMES_KEY])
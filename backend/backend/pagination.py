@@ -1,5 +1,172 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from backend.constants import ESTIMATED_COUNT_THRESHOLD
+
+
+def estimate_count(queryset):
+    """Оценка числа строк по статистике PostgreSQL (pg_class.reltuples).
+
+    Возвращает None, если оценка неприменима: у выборки есть условия,
+    база не PostgreSQL или таблица слишком мала для неточного ответа.
+    """
+    query = queryset.query
+    connection = connections[queryset.db]
+    if (connection.vendor != 'postgresql' or query.where
+            or query.distinct or query.low_mark or query.high_mark):
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < ESTIMATED_COUNT_THRESHOLD:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который не считает COUNT(*) по большим таблицам."""
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is not None:
+            return estimate
+        return super().count
+
+
+class KeysetPagination(CursorPagination):
+    """Курсорная пагинация по текущей сортировке выборки (обычно -id)."""
+    page_size_query_param = 'limit'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        if ordering and all(isinstance(field, str) for field in ordering):
+            return tuple(ordering)
+        return ('-id',)
 
 
 class CustomPagination(PageNumberPagination):
+    """Постраничная пагинация ?page=&limit= или курсорная по ?cursor=."""
     page_size_query_param = "limit"
+    django_paginator_class = EstimatedCountPaginator
+    cursor_query_param = 'cursor'
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = KeysetPagination()
+        page = self.cursor_paginator.paginate_queryset(
+            queryset, request, view)
+        self.display_page_controls = (
+            self.cursor_paginator.display_page_controls)
+        return page
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+
+class CompositeKeysetPagination(BasePagination):
+    """Keyset-пагинация по нескольким полям сортировки по убыванию.
+
+    Курсор хранит значения полей последней строки страницы; следующая
+    страница выбирается условием (pub_date, id) < (курсор) без OFFSET.
+    В отличие от CursorPagination, позиция не зависит от повторов
+    значения первого поля.
+    """
+    ordering = ('-pub_date', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request, model, fields):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode()))
+            return [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(fields, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, values):
+        encoded = json.dumps([
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ]).encode()
+        return urlsafe_b64encode(encoded).decode()
+
+    def after(self, fields, values):
+        """Условие (f1, f2, ...) < (v1, v2, ...) для индекса по полям."""
+        condition = Q()
+        for index, field in enumerate(fields):
+            clause = Q(**{f'{field}__lt': values[index]})
+            for previous, value in zip(fields[:index], values):
+                clause &= Q(**{previous: value})
+            condition |= clause
+        return Q(**{f'{fields[0]}__lte': values[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        fields = [field.lstrip('-') for field in self.ordering]
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model, fields)
+        if position is not None:
+            queryset = queryset.filter(self.after(fields, position))
+        page = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_position = [
+                getattr(page[-1], field) for field in fields]
+        return page
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
@@ -0,0 +1,104 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """Обёртка execute_wrapper: число запросов, время и повторы SQL.
+
+    SQL приходит с плейсхолдерами, поэтому одинаковый текст с разными
+    параметрами считается одним отпечатком - так видны N+1.
+    """
+    __slots__ = ('count', 'duration', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            stats = self.statements.get(sql)
+            if stats is None:
+                self.statements[sql] = [1, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+
+    @property
+    def max_repeats(self):
+        return max(
+            (count for count, _ in self.statements.values()), default=0)
+
+    def top(self, limit):
+        """Самые частые, затем самые долгие запросы."""
+        return sorted(
+            self.statements.items(),
+            key=lambda item: (item[1][0], item[1][1]),
+            reverse=True,
+        )[:limit]
+
+
+class QueryStatsMiddleware:
+    """Считает запросы к базе для каждого HTTP-запроса.
+
+    Добавляет заголовок Server-Timing и пишет в лог запросы, вышедшие
+    за settings.QUERY_BUDGETS, вместе с самыми частыми SQL. Работает
+    без DEBUG.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        if settings.QUERY_STATS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration * 1000:.1f};'
+                f'desc="{recorder.count} queries", '
+                f'total;dur={total * 1000:.1f}'
+            )
+        self.check_budgets(request, recorder)
+        return response
+
+    def check_budgets(self, request, recorder):
+        budgets = settings.QUERY_BUDGETS
+        exceeded = [
+            f'{name} {value} > {budgets[name]}'
+            for name, value in (
+                ('queries', recorder.count),
+                ('db_ms', round(recorder.duration * 1000)),
+                ('repeats', recorder.max_repeats),
+            )
+            if value > budgets[name]
+        ]
+        if not exceeded:
+            return
+        logger.warning(
+            '%s %s: %s, запросов %d, в базе %.1f мс\n%s',
+            request.method, request.get_full_path(), ', '.join(exceeded),
+            recorder.count, recorder.duration * 1000,
+            '\n'.join(
+                f'  {count}x {duration * 1000:.1f} мс: {sql}'
+                for sql, (count, duration) in recorder.top(
+                    settings.QUERY_STATS_LOG_STATEMENTS)
+            ),
+        )
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+
+from backend import metrics
+from backend.constants import (USER_RELATIONS_CACHE_TIMEOUT,
+                               USER_RELATIONS_KEY, USER_RELATIONS_VERSION_KEY)
+from backend.versions import get_version
+
+
+class UserRelations:
+    """Избранное, корзина и подписки пользователя в виде множеств id."""
+    __slots__ = ('favorite_ids', 'cart_ids', 'author_ids')
+
+    def __init__(self, favorite_ids, cart_ids, author_ids):
+        self.favorite_ids = frozenset(favorite_ids)
+        self.cart_ids = frozenset(cart_ids)
+        self.author_ids = frozenset(author_ids)
+
+    @classmethod
+    def load(cls, user):
+        return cls(
+            user.favorites.values_list('recipe_id', flat=True),
+            user.shopping_cart.values_list('recipe_id', flat=True),
+            user.subscriber.values_list('author_id', flat=True),
+        )
+
+    def __getstate__(self):
+        return (
+            tuple(self.favorite_ids), tuple(self.cart_ids),
+            tuple(self.author_ids),
+        )
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+def get_user_relations(user):
+    """Связи пользователя из кеша по текущей версии.
+
+    Версию сбрасывают add_to, delete_from и subscribe, поэтому после
+    изменения следующий запрос загрузит множества заново.
+    """
+    version = get_version(USER_RELATIONS_VERSION_KEY.format(user.id))
+    key = USER_RELATIONS_KEY.format(user.id, version)
+    relations = cache.get(key)
+    metrics.record('relations', relations is not None)
+    if relations is None:
+        relations = UserRelations.load(user)
+        cache.set(key, relations, USER_RELATIONS_CACHE_TIMEOUT)
+    return relations
+
+
+def request_relations(request):
+    """Связи текущего пользователя, загруженные один раз на запрос.
+
+    Для анонимного пользователя возвращает None.
+    """
+    if request is None or not request.user.is_authenticated:
+        return None
+    relations = getattr(request, '_user_relations', None)
+    if relations is None:
+        relations = get_user_relations(request.user)
+        request._user_relations = relations
+    return relations
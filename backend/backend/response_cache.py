@@ -0,0 +1,72 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from backend import metrics
+from backend.constants import (RESPONSE_CACHE_GENERATION_KEY,
+                               RESPONSE_CACHE_KEY)
+from backend.versions import bump_version, get_version
+
+
+def bump_response_generation():
+    """Делает недействительными все закешированные ответы.
+
+    Поколение меняется после коммита, иначе параллельный запрос успел бы
+    закешировать старые данные под новым поколением.
+    """
+    transaction.on_commit(
+        lambda: bump_version(RESPONSE_CACHE_GENERATION_KEY))
+
+
+def normalized_query(request):
+    """Параметры запроса в каноническом виде: порядок и пустые не важны."""
+    params = request.query_params
+    return urlencode(sorted(
+        (key, value)
+        for key in params
+        for value in params.getlist(key)
+        if value != ''
+    ))
+
+
+class AnonymousCacheMixin:
+    """Кеширует данные ответов list/retrieve для анонимных пользователей.
+
+    Время жизни задаётся в settings.RESPONSE_CACHE_TIMEOUTS по имени
+    response_cache_name. Ключ включает поколение, которое сигналы
+    повышают при изменении рецептов, тегов и ингредиентов.
+    """
+    response_cache_name = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, method, request, *args, **kwargs):
+        name = self.response_cache_name
+        timeout = settings.RESPONSE_CACHE_TIMEOUTS.get(name)
+        if not timeout or not request.user.is_anonymous:
+            return method(request, *args, **kwargs)
+        # В данных абсолютные URL (next, изображения), поэтому схема и
+        # хост входят в ключ.
+        digest = hashlib.sha1(
+            f'{request.build_absolute_uri(request.path)}?'
+            f'{normalized_query(request)}'.encode()
+        ).hexdigest()
+        key = RESPONSE_CACHE_KEY.format(
+            name, get_version(RESPONSE_CACHE_GENERATION_KEY), digest)
+        data = cache.get(key)
+        metrics.record(f'responses:{name}', data is not None)
+        if data is not None:
+            return Response(data)
+        response = method(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout)
+        return response
@@ -27,10 +27,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
+    'backend.query_stats.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'backend.db_routing.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -74,6 +77,33 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения через запятую (база, пользователь и пароль те же, что
+# у основной): для PostgreSQL - DB_REPLICAS=host1:5432,host2, для SQLite -
+# пути к файлам. Безопасные запросы читают с реплик.
+
+DATABASE_REPLICAS = []
+
+for number, address in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(','))):
+    alias = f'replica_{number}'
+    replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if replica['ENGINE'] == 'django.db.backends.sqlite3':
+        replica['NAME'] = address.strip()
+    else:
+        host, _, port = address.strip().partition(':')
+        replica.update(
+            HOST=host,
+            PORT=port or replica['PORT'],
+            OPTIONS={**replica.get('OPTIONS', {}), 'connect_timeout': 2},
+        )
+    DATABASES[alias] = replica
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['backend.db_routing.PrimaryReplicaRouter']
+
+# Сколько секунд после записи пользователь читает из основной базы.
+DATABASE_STICKY_SECONDS = int(os.getenv('DB_STICKY_SECONDS', 10))
+
 # Меняем настройку Django: теперь для работы будет использоваться
 # бэкенд sqlite3
 
@@ -86,6 +116,44 @@ DATABASES = {
 }
 '''
 
+# Общий для всех воркеров gunicorn и фоновых задач кеш: версии каталога и
+# прочие счётчики. Файловый кеш должен лежать на томе, общем для backend
+# и worker. Фрагменты рецептов лежат в отдельном кеше, чтобы их
+# вытеснение не задевало версии, токены и метрики.
+
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND',
+    'django.core.cache.backends.filebased.FileBasedCache'
+)
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', '/tmp/foodgram_cache')
+FILE_CACHE = CACHE_BACKEND.endswith('.FileBasedCache')
+
+
+def cache_options(max_entries):
+    # По умолчанию Django держит 300 записей и при переполнении удаляет
+    # треть; memcached и redis не принимают MAX_ENTRIES.
+    return {'MAX_ENTRIES': max_entries} if FILE_CACHE else {}
+
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': cache_options(
+            int(os.getenv('CACHE_MAX_ENTRIES', 20000))),
+    },
+    'fragments': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': (
+            os.path.join(CACHE_LOCATION, 'fragments') if FILE_CACHE
+            else CACHE_LOCATION
+        ),
+        'KEY_PREFIX': 'fragments',
+        'OPTIONS': cache_options(
+            int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 50000))),
+    },
+}
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -127,12 +195,47 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'backend.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
 }
 
+# Бюджеты одного HTTP-запроса к базе: число SQL, время в базе (мс) и
+# повторы одного SQL. Превышения пишутся в лог backend.query_stats.
+QUERY_BUDGETS = {
+    'queries': int(os.getenv('QUERY_BUDGET_QUERIES', 20)),
+    'db_ms': int(os.getenv('QUERY_BUDGET_DB_MS', 200)),
+    'repeats': int(os.getenv('QUERY_BUDGET_REPEATS', 3)),
+}
+
+# Сколько самых частых SQL выводить в лог при превышении.
+QUERY_STATS_LOG_STATEMENTS = 5
+
+QUERY_STATS_SERVER_TIMING = str(
+    os.getenv('QUERY_STATS_SERVER_TIMING', True)).lower() == 'true'
+
+# Время жизни (с) кеша ответов анонимным пользователям, 0 - выключен.
+RESPONSE_CACHE_TIMEOUTS = {
+    'recipes': 60,
+    'ingredients': 60 * 60,
+    'tags': 60 * 60,
+}
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 TEST_EMAIL = 'Testemail@gmail.com'
 
 DJOSER = {
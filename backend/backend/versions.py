@@ -0,0 +1,40 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_version(key):
+    """Текущая версия данных из общего кеша.
+
+    Версия - метка времени в наносекундах, поэтому после вытеснения ключа
+    из кеша новое значение не совпадёт ни с одной из прежних версий.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(*keys):
+    """Версии нескольких ключей одним обращением к кешу."""
+    versions = cache.get_many(keys)
+    return [
+        versions[key] if key in versions else get_version(key)
+        for key in keys
+    ]
+
+
+def bump_version(key):
+    """Помечает данные изменёнными для всех процессов."""
+    cache.set(key, time.time_ns(), None)
+
+
+def bump_version_on_commit(key):
+    """Меняет версию после коммита текущей транзакции.
+
+    Иначе параллельный запрос успел бы прочитать старые строки и
+    закешировать их под новой версией.
+    """
+    transaction.on_commit(lambda: bump_version(key))
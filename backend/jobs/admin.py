@@ -0,0 +1,27 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from backend.pagination import EstimatedCountPaginator
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Админка для фоновых задач."""
+    list_display = (
+        'id', 'task', 'status', 'attempts', 'run_at', 'locked_by',
+        'finished_at',
+    )
+    list_filter = ('status',)
+    search_fields = ('task__startswith',)
+    readonly_fields = ('created_at', 'locked_at', 'locked_by', 'finished_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('retry',)
+
+    @admin.action(description='Повторить выбранные задачи')
+    def retry(self, request, queryset):
+        queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(),
+            locked_at=None, finished_at=None,
+        )
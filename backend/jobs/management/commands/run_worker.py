@@ -0,0 +1,89 @@
+import logging
+import os
+import signal
+import socket
+import threading
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from backend.constants import JOB_POLL_INTERVAL
+from jobs.models import Job
+from jobs.queue import run_job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в несколько потоков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Число потоков, одновременно выполняющих задачи.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=JOB_POLL_INTERVAL,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда очередь опустеет.',
+        )
+        parser.add_argument(
+            '--keep-done', action='store_true',
+            help='Оставлять выполненные задачи в таблице.',
+        )
+
+    def handle(self, *args, concurrency, poll_interval, once, keep_done,
+               **options):
+        self.stop = threading.Event()
+        self.results = Counter()
+        self.lock = threading.Lock()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self.stop.set())
+
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f'{name}:{number}', poll_interval, once, keep_done),
+                name=f'job-worker-{number}',
+            )
+            for number in range(max(concurrency, 1))
+        ]
+        self.stdout.write(f'Воркер {name}: потоков {len(threads)}')
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stdout.write(self.style.SUCCESS(
+            f'Остановлен: выполнено {self.results["done"]}, '
+            f'с ошибкой {self.results["failed"]}.'
+        ))
+
+    def work(self, worker, poll_interval, once, keep_done):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    job = Job.objects.claim(worker)
+                except Exception:
+                    logger.exception('Не удалось получить задачу')
+                    self.stop.wait(poll_interval)
+                    continue
+                if job is None:
+                    if once:
+                        return
+                    self.stop.wait(poll_interval)
+                    continue
+                try:
+                    done = run_job(job, keep_done=keep_done)
+                except Exception:
+                    logger.exception('Не удалось записать итог %s', job)
+                    done = False
+                with self.lock:
+                    self.results['done' if done else 'failed'] += 1
+        finally:
+            connections.close_all()
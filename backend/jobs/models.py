@@ -0,0 +1,147 @@
+import random
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from backend.constants import (JOB_LOCK_TIMEOUT, JOB_MAX_ATTEMPTS,
+                               JOB_RETRY_DELAY, JOB_RETRY_MAX_DELAY)
+
+
+class JobQuerySet(models.QuerySet):
+
+    def ready(self):
+        """Задачи, которые можно взять в работу.
+
+        Зависшие задачи упавшего воркера возвращаются в очередь
+        по истечении JOB_LOCK_TIMEOUT.
+        """
+        now = timezone.now()
+        return self.filter(
+            Q(status=Job.QUEUED, run_at__lte=now)
+            | Q(
+                status=Job.RUNNING,
+                locked_at__lt=now - timedelta(seconds=JOB_LOCK_TIMEOUT),
+            )
+        )
+
+    def claim(self, worker):
+        """Забирает одну задачу для воркера или возвращает None.
+
+        SKIP LOCKED позволяет воркерам не ждать друг друга, а условный
+        UPDATE не даёт взять задачу дважды там, где блокировок строк нет.
+        """
+        with transaction.atomic():
+            job = self.ready().select_for_update(
+                skip_locked=True
+            ).order_by('run_at', 'id').first()
+            if job is None:
+                return None
+            claimed = self.filter(
+                pk=job.pk, status=job.status, attempts=job.attempts
+            ).update(
+                status=Job.RUNNING,
+                locked_at=timezone.now(),
+                locked_by=worker,
+                attempts=F('attempts') + 1,
+            )
+        if not claimed:
+            return None
+        job.refresh_from_db()
+        return job
+
+
+class Job(models.Model):
+    """Фоновая задача, которую выполняет manage.py run_worker."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    task = models.CharField(
+        'Задача',
+        max_length=255
+    )
+    args = models.JSONField(
+        'Аргументы',
+        default=list,
+        blank=True
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Попытки',
+        default=0
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток',
+        default=JOB_MAX_ATTEMPTS
+    )
+    run_at = models.DateTimeField(
+        'Запустить после',
+        default=timezone.now
+    )
+    locked_at = models.DateTimeField(
+        'Взята в работу',
+        blank=True,
+        null=True
+    )
+    locked_by = models.CharField(
+        'Воркер',
+        max_length=255,
+        blank=True
+    )
+    last_error = models.TextField(
+        'Последняя ошибка',
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        'Создана',
+        auto_now_add=True
+    )
+    finished_at = models.DateTimeField(
+        'Завершена',
+        blank=True,
+        null=True
+    )
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ('-id',)
+        indexes = [
+            models.Index(
+                fields=['run_at', 'id'],
+                name='job_queued_idx',
+                condition=Q(status='queued'),
+            ),
+            models.Index(
+                fields=['locked_at'],
+                name='job_running_idx',
+                condition=Q(status='running'),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.id}'
+
+    def retry_delay(self):
+        """Экспоненциальная задержка перед повтором с небольшим разбросом."""
+        delay = min(
+            JOB_RETRY_DELAY * 2 ** max(self.attempts - 1, 0),
+            JOB_RETRY_MAX_DELAY,
+        )
+        return timedelta(seconds=delay * random.uniform(1, 1.25))
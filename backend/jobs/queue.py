@@ -0,0 +1,72 @@
+import logging
+import traceback
+
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def task(func):
+    """Помечает функцию как фоновую задачу, которую можно ставить в очередь.
+
+    Аргументы задачи сохраняются в JSON, поэтому передавать нужно
+    идентификаторы, а не объекты моделей.
+    """
+    func.job_name = f'{func.__module__}.{func.__qualname__}'
+    return func
+
+
+def enqueue(func, *args, run_at=None, max_attempts=None):
+    """Ставит задачу в очередь и сразу возвращает созданный Job.
+
+    Запись создаётся в текущей транзакции, поэтому воркер увидит задачу
+    только после её коммита.
+    """
+    if not hasattr(func, 'job_name'):
+        raise ValueError(f'{func!r} не помечена декоратором @task.')
+    job = Job(task=func.job_name, args=list(args))
+    if run_at is not None:
+        job.run_at = run_at
+    if max_attempts is not None:
+        job.max_attempts = max_attempts
+    job.save()
+    return job
+
+
+def resolve(name):
+    func = import_string(name)
+    if getattr(func, 'job_name', None) != name:
+        raise ImportError(f'{name} не является фоновой задачей.')
+    return func
+
+
+def run_job(job, keep_done=False):
+    """Выполняет взятую задачу и записывает результат."""
+    jobs = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    try:
+        resolve(job.task)(*job.args)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            logger.warning(
+                'Задача %s упала, повтор %s из %s',
+                job, job.attempts, job.max_attempts)
+            jobs.update(
+                status=Job.QUEUED, last_error=error, locked_at=None,
+                run_at=timezone.now() + job.retry_delay(),
+            )
+        else:
+            logger.error('Задача %s не выполнена:\n%s', job, error)
+            jobs.update(
+                status=Job.FAILED, last_error=error,
+                finished_at=timezone.now(),
+            )
+        return False
+    if keep_done:
+        jobs.update(status=Job.DONE, finished_at=timezone.now())
+    else:
+        jobs.delete()
+    return True
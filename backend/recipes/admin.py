@@ -1,54 +1,108 @@
 from django.contrib import admin
 from django.contrib.admin import display
+from django.db.models import Count
 
+from backend.pagination import EstimatedCountPaginator
 from .models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Subscribe, Tag)
+                     ShoppingCart, ShoppingCartIngredient, ShortLink,
+                     Subscribe, Tag)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Базовая админка для больших таблиц: без полного COUNT(*)."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(LargeTableAdmin):
     """Админка для ингредиентов."""
     list_display = ('name', 'measurement_unit',)
-    list_filter = ('name',)
+    search_fields = ('name__startswith',)
 
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     """Админка для тегов."""
-    list_display = ('name', 'color', 'slug',)
+    list_display = ('name', 'color', 'slug', 'recipes_count')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_total=Count('recipes'))
+
+    @display(description='Количество рецептов', ordering='recipes_total')
+    def recipes_count(self, obj):
+        return obj.recipes_total
+
+
+class RecipeIngredientInline(admin.TabularInline):
+    """Ингредиенты на странице рецепта."""
+    model = RecipeIngredient
+    autocomplete_fields = ('ingredient',)
+    extra = 0
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     """Админка для рецептов."""
     list_display = ('name', 'id', 'author', 'added_in_favorites')
     readonly_fields = ('added_in_favorites',)
-    list_filter = ('author', 'name', 'tags',)
-
-    @display(description='Количество в избранных')
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    search_fields = ('name__startswith', 'author__email__startswith',
+                     'author__username__startswith')
+    autocomplete_fields = ('author',)
+    inlines = (RecipeIngredientInline,)
+
+    @display(description='Количество в избранных', ordering='favorites_count')
     def added_in_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(RecipeIngredient)
-class IngredientInRecipe(admin.ModelAdmin):
+class IngredientInRecipe(LargeTableAdmin):
     """Админка для промежуточной модели ингредиент - рецепт."""
     list_display = ('recipe', 'ingredient', 'amount',)
+    list_select_related = ('recipe__author', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
 
 
 @admin.register(FavoriteRecipe)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     """Админка для Избранного."""
     list_display = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe__author')
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(Subscribe)
-class SubscribeAdmin(admin.ModelAdmin):
+class SubscribeAdmin(LargeTableAdmin):
     """Админка для подписок."""
     list_display = ('user', 'author',)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     """Админка для корзины покупок."""
     list_display = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe__author')
+    autocomplete_fields = ('user', 'recipe')
+
+
+@admin.register(ShoppingCartIngredient)
+class ShoppingCartIngredientAdmin(LargeTableAdmin):
+    """Админка для сводного списка покупок."""
+    list_display = ('user', 'ingredient', 'total_amount',)
+    list_select_related = ('user', 'ingredient')
+    raw_id_fields = ('user', 'ingredient')
+
+
+@admin.register(ShortLink)
+class ShortLinkAdmin(LargeTableAdmin):
+    """Админка для коротких ссылок."""
+    list_display = ('code', 'recipe',)
+    list_select_related = ('recipe__author',)
+    search_fields = ('code',)
+    raw_id_fields = ('recipe',)
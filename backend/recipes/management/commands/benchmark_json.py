@@ -0,0 +1,78 @@
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import RecipeReadSerializer
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость стандартных и orjson-рендерера и парсера '
+        'на списке рецептов и проверяет совпадение вывода.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=50,
+            help='Сколько рецептов в ответе.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Сколько раз рендерить ответ.',
+        )
+
+    def handle(self, *args, limit, repeat, **options):
+        if orjson is None:
+            raise CommandError('orjson не установлен.')
+        # Хост из ALLOWED_HOSTS, иначе build_absolute_uri даст
+        # DisallowedHost для адреса testserver.
+        host = next(
+            (host.lstrip('.') for host in settings.ALLOWED_HOSTS
+             if host != '*'),
+            'localhost',
+        )
+        request = Request(APIRequestFactory().get(
+            '/api/recipes/', SERVER_NAME=host))
+        recipes = Recipe.objects.for_read()[:limit]
+        data = {
+            'count': limit,
+            'next': None,
+            'previous': None,
+            'results': RecipeReadSerializer(
+                recipes, many=True, context={'request': request}).data,
+        }
+        standard = JSONRenderer().render(data)
+        fast = FastJSONRenderer().render(data)
+        if standard != fast:
+            raise CommandError('Вывод рендереров различается.')
+        self.stdout.write(
+            f'Рецептов {len(data["results"])}, ответ {len(standard)} байт, '
+            'вывод совпадает.'
+        )
+        for name, render in (
+            ('JSONRenderer', JSONRenderer().render),
+            ('FastJSONRenderer', FastJSONRenderer().render),
+        ):
+            self.report(name, repeat, lambda: render(data))
+        for name, parse in (
+            ('JSONParser', lambda: JSONParser().parse(BytesIO(standard))),
+            ('FastJSONParser', lambda: FastJSONParser().parse(
+                BytesIO(standard))),
+        ):
+            self.report(name, repeat, parse)
+
+    def report(self, name, repeat, func):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        elapsed = (time.perf_counter() - started) / repeat * 1000
+        self.stdout.write(f'{name}: {elapsed:.3f} мс')
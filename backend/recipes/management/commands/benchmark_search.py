@@ -0,0 +1,132 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+WORDS = (
+    'борщ', 'суп', 'салат', 'курица', 'говядина', 'свинина', 'рыба',
+    'картофель', 'морковь', 'лук', 'чеснок', 'грибы', 'сыр', 'сметана',
+    'томаты', 'перец', 'рис', 'гречка', 'паста', 'пирог', 'блины',
+    'запечённый', 'жареный', 'тушёный', 'домашний', 'острый', 'сладкий',
+    'яблоки', 'тыква', 'капуста', 'свёкла', 'укроп', 'петрушка', 'масло',
+)
+
+DEFAULT_TERMS = ('курица', 'суп с грибами', 'пирог -яблоки')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время поиска рецептов (?search=). С --seed сначала '
+        'добавляет синтетические рецепты и после замера откатывает их, '
+        'если не указан --keep.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'terms', nargs='*', default=DEFAULT_TERMS,
+            help='Поисковые запросы.',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Сколько синтетических рецептов добавить перед замером.',
+        )
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Оставить синтетические рецепты в базе.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Размер пачки вставки при --seed.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выполнить каждый запрос.',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=6,
+            help='Размер страницы выдачи.',
+        )
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Показать план запроса.',
+        )
+
+    def handle(self, *args, terms, seed, keep, batch_size, repeat, limit,
+               explain, **options):
+        with transaction.atomic():
+            if seed:
+                self.seed(seed, batch_size)
+            self.measure(terms, repeat, limit, explain)
+            if seed and not keep:
+                transaction.set_rollback(True)
+                self.stdout.write('Синтетические рецепты удалены откатом.')
+
+    def measure(self, terms, repeat, limit, explain):
+        self.stdout.write(
+            f'{connection.vendor}: рецептов {Recipe.objects.count()}')
+        for term in terms:
+            queryset = Recipe.objects.search(term)
+            page = queryset.values_list('id', flat=True)[:limit]
+            timings = []
+            for _ in range(max(repeat, 1)):
+                started = time.perf_counter()
+                list(page)
+                timings.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            total = queryset.count()
+            count_time = (time.perf_counter() - started) * 1000
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(
+                f'"{term}": найдено {total} (count {count_time:.1f} мс), '
+                f'страница медиана {statistics.median(timings):.1f} мс, '
+                f'p95 {p95:.1f} мс'
+            )
+            if explain:
+                analyze = {'analyze': True} if (
+                    connection.vendor == 'postgresql') else {}
+                self.stdout.write(page.explain(**analyze))
+
+    def seed(self, total, batch_size):
+        author, _ = User.objects.get_or_create(
+            email='search-benchmark@example.com',
+            defaults={
+                'username': 'search_benchmark',
+                'first_name': 'Benchmark',
+                'last_name': 'Search',
+            },
+        )
+        rng = random.Random(total)
+        created = 0
+        started = time.monotonic()
+        while created < total:
+            size = min(batch_size, total - created)
+            with transaction.atomic():
+                Recipe.objects.bulk_create([
+                    Recipe(
+                        author=author,
+                        name=' '.join(rng.sample(WORDS, 3)).capitalize(),
+                        text=' '.join(rng.choices(WORDS, k=40)),
+                        cooking_time=rng.randint(5, 180),
+                    )
+                    for _ in range(size)
+                ])
+            created += size
+            self.stdout.write(f'Добавлено {created} из {total}')
+        User.objects.filter(pk=author.pk).update(
+            recipes_count=F('recipes_count') + total)
+        if connection.vendor == 'postgresql':
+            # Статистика для планировщика; внутри транзакции ANALYZE видит
+            # ещё не закоммиченные строки и откатывается вместе с ними.
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE recipes_recipe')
+        self.stdout.write(
+            f'Наполнение заняло {time.monotonic() - started:.1f} с')
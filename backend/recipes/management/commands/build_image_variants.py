@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.images import process_avatar, process_recipe_image
+from jobs.queue import enqueue
+from recipes.models import Recipe
+from users.models import User
+
+TARGETS = (
+    (Recipe, 'image', process_recipe_image),
+    (User, 'avatar', process_avatar),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Ставит в очередь построение миниатюр и WebP-версий изображений '
+        'рецептов и аватаров, загруженных до появления вариантов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перестроить варианты даже для актуальных изображений.',
+        )
+
+    def handle(self, *args, force, **options):
+        for model, field, task in TARGETS:
+            scheduled = 0
+            rows = model.objects.exclude(
+                **{f'{field}__isnull': True}
+            ).exclude(**{field: ''}).values_list(
+                'id', field, f'{field}_variants'
+            ).order_by('id').iterator()
+            with transaction.atomic():
+                for pk, name, variants in rows:
+                    if force or variants.get('source') != name:
+                        enqueue(task, pk, name)
+                        scheduled += 1
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: '
+                f'в очереди {scheduled}')
+        self.stdout.write(self.style.SUCCESS(
+            'Готово. Задачи выполнит manage.py run_worker.'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from backend import metrics
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает попадания и промахи кешей. Процессы сбрасывают '
+        'счётчики в общий кеш с задержкой до METRICS_FLUSH_INTERVAL секунд.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода.',
+        )
+
+    def handle(self, *args, reset, **options):
+        stats = metrics.get_stats()
+        if not stats:
+            self.stdout.write('Данных пока нет.')
+        for name, (hits, misses) in stats.items():
+            total = hits + misses
+            rate = hits / total * 100 if total else 0
+            self.stdout.write(
+                f'{name}: попаданий {hits}, промахов {misses}, '
+                f'доля попаданий {rate:.1f}%'
+            )
+        if reset:
+            metrics.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Счётчики обнулены.'))
@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from backend.constants import INGREDIENTS_VERSION_KEY
+from backend.response_cache import bump_response_generation
+from backend.versions import bump_version
+from recipes.models import Ingredient
+
+DEFAULT_PATH = settings.BASE_DIR.parent / 'data' / 'ingredients.csv'
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def iter_json(file):
+    """Читает массив объектов JSON по одному, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив ингредиентов.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Файл JSON обрывается.')
+            buffer += chunk
+            continue
+        yield item['name'], item['measurement_unit']
+        buffer = buffer[end:]
+
+
+READERS = {'.csv': iter_csv, '.json': iter_json}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из CSV или JSON без дублей по паре '
+        '(название, единица измерения). Повторный запуск ничего не меняет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default=str(DEFAULT_PATH),
+            help='Файл .csv (название,единица) или .json.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Размер пачки вставки.',
+        )
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже на PostgreSQL.',
+        )
+
+    def handle(self, *args, path, batch_size, no_copy, **options):
+        path = Path(path)
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json.')
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден.')
+
+        use_copy = connection.vendor == 'postgresql' and not no_copy
+        write_batch = self.copy_batch if use_copy else self.insert_batch
+        self.started = time.monotonic()
+        before = Ingredient.objects.count()
+        seen = set()
+        batch = []
+        processed = 0
+        with path.open(encoding='utf-8') as file, transaction.atomic():
+            if use_copy:
+                self.create_staging_table()
+            for name, measurement_unit in reader(file):
+                key = (name.strip(), measurement_unit.strip())
+                if not key[0] or key in seen:
+                    continue
+                seen.add(key)
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    processed = self.flush(write_batch, batch, processed)
+                    batch = []
+            if batch:
+                processed = self.flush(write_batch, batch, processed)
+            if use_copy:
+                self.merge_staging_table()
+        bump_version(INGREDIENTS_VERSION_KEY)
+        bump_response_generation()
+        created = Ingredient.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: уникальных строк {processed}, добавлено {created} '
+            f'за {time.monotonic() - self.started:.2f} с.'
+        ))
+
+    def flush(self, write_batch, batch, processed):
+        write_batch(batch)
+        processed += len(batch)
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        self.stdout.write(
+            f'Обработано {processed} строк, {processed / elapsed:.0f} строк/с')
+        return processed
+
+    def insert_batch(self, batch):
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in batch
+            ],
+            ignore_conflicts=True,
+        )
+
+    def create_staging_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_staging ('
+                'name varchar(200), measurement_unit varchar(200)'
+                ') ON COMMIT DROP'
+            )
+
+    def copy_batch(self, batch):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                'COPY ingredient_staging (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+
+    def merge_staging_table(self):
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_staging '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, Subscribe
+
+User = get_user_model()
+
+
+def count_of(model, field):
+    """Подзапрос с числом строк model, ссылающихся на текущую запись."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscribe, 'author'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет денормализованные счётчики рецептов и пользователей '
+        'с таблицами связей и исправляет расхождения.'
+    )
+
+    def handle(self, *args, **options):
+        for model, counter, related_model, field in COUNTERS:
+            actual = count_of(related_model, field)
+            fixed = model.objects.exclude(**{counter: actual}).update(
+                **{counter: actual})
+            self.stdout.write(
+                f'{model._meta.label}.{counter}: исправлено {fixed}')
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingCartIngredient
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает сводный список покупок по корзинам пользователей '
+        'или проверяет его расхождение с корзинами (--verify).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только проверить таблицу, ничего не меняя.',
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Обработать только указанных пользователей (id).',
+        )
+
+    def handle(self, *args, verify=False, user_ids=None, **options):
+        totals = ShoppingCartIngredient.objects.all()
+        if user_ids:
+            totals = totals.filter(user_id__in=user_ids)
+        with transaction.atomic():
+            expected = ShoppingCartIngredient.objects.expected_totals(
+                user_ids)
+            actual = {
+                (row.user_id, row.ingredient_id): row.total_amount
+                for row in totals.select_for_update()
+            }
+            drift = {
+                key for key in expected.keys() | actual.keys()
+                if expected.get(key) != actual.get(key)
+            }
+            if verify:
+                for user_id, ingredient_id in sorted(drift):
+                    self.stdout.write(
+                        f'user={user_id} ingredient={ingredient_id}: '
+                        f'ожидается {expected.get((user_id, ingredient_id))}, '
+                        f'в таблице {actual.get((user_id, ingredient_id))}'
+                    )
+                if drift:
+                    raise CommandError(f'Расхождений: {len(drift)}.')
+                self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+                return
+            totals.delete()
+            ShoppingCartIngredient.objects.bulk_create(
+                ShoppingCartIngredient(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    total_amount=total_amount,
+                )
+                for (user_id, ingredient_id), total_amount in expected.items()
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Таблица пересобрана, исправлено строк: {len(drift)}.'))
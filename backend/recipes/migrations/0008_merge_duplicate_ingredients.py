@@ -0,0 +1,56 @@
+# Generated by Django 3.2.3 on 2026-10-17 12:30
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        extra_ids = list(Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit'],
+        ).exclude(id=keep_id).values_list('id', flat=True))
+        for row in RecipeIngredient.objects.filter(
+                ingredient_id__in=extra_ids):
+            kept = RecipeIngredient.objects.filter(
+                recipe_id=row.recipe_id, ingredient_id=keep_id).first()
+            if kept is not None:
+                # Количество дубля переходит в оставшуюся строку, как и в
+                # ShoppingCartIngredient ниже.
+                kept.amount += row.amount
+                kept.save(update_fields=['amount'])
+                row.delete()
+            else:
+                row.ingredient_id = keep_id
+                row.save(update_fields=['ingredient'])
+        for row in ShoppingCartIngredient.objects.filter(
+                ingredient_id__in=extra_ids):
+            kept, _ = ShoppingCartIngredient.objects.get_or_create(
+                user_id=row.user_id, ingredient_id=keep_id,
+                defaults={'total_amount': 0},
+            )
+            kept.total_amount += row.total_amount
+            kept.save(update_fields=['total_amount'])
+            row.delete()
+        Ingredient.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_name_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,20 @@
+from string import ascii_letters, digits
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import connections, models
+from django.db.models import (Exists, F, Func, OuterRef, Prefetch, Q, Sum,
+                              UniqueConstraint, Window)
+from django.db.models.functions import RowNumber
 
-from backend.constants import MIN_VALUE, MAX_VALUE
+from backend.constants import MIN_VALUE, MAX_VALUE, SEARCH_CONFIG
 
 User = get_user_model()
 
+BASE62_ALPHABET = digits + ascii_letters
+
 
 class Tag(models.Model):
     """Модель тегов."""
@@ -40,7 +48,8 @@ class Ingredient(models.Model):
     """Модель ингредиентов."""
     name = models.CharField(
         'Название',
-        max_length=200
+        max_length=200,
+        db_index=True
     )
     measurement_unit = models.CharField(
         'Единица измерения',
@@ -51,11 +60,115 @@ class Ingredient(models.Model):
         ordering = ['name']
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_name_unit'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}.'
 
 
+def read_prefetches():
+    """Связанные данные, нужные для чтения рецепта."""
+    return (
+        Prefetch('tags', queryset=Tag.objects.all()),
+        Prefetch(
+            'ingredient_list',
+            queryset=RecipeIngredient.objects.select_related('ingredient'),
+        ),
+    )
+
+
+class UnicodeLower(Func):
+    """LOWER для любых букв: встроенный lower() SQLite меняет только ASCII.
+
+    На SQLite вызывает UNICODE_LOWER, которую регистрирует сигнал
+    connection_created в recipes.signals.
+    """
+    function = 'LOWER'
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function='UNICODE_LOWER', **extra_context)
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Кверисет рецептов."""
+
+    def for_read(self):
+        """План выборки рецептов для чтения без запросов на каждую строку.
+
+        Флаги текущего пользователя берутся из backend.relations.
+        """
+        return self.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(*read_prefetches())
+
+    def for_list(self):
+        """Выборка для списков: только строки рецептов.
+
+        Автора, теги и ингредиенты сериализатор списка догружает через
+        read_prefetches() лишь для рецептов, которых нет в кеше.
+        """
+        return self.defer('search_vector')
+
+    def feed(self, user):
+        """Рецепты авторов, на которых подписан user, новые сверху."""
+        return self.filter(
+            Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('author'))),
+            pub_date__isnull=False,
+        ).order_by('-pub_date', '-id')
+
+    def search(self, term):
+        """Полнотекстовый поиск по названию и описанию.
+
+        На PostgreSQL - по столбцу search_vector с GIN-индексом и
+        сортировкой по ts_rank, на остальных СУБД - через LIKE по
+        названию и описанию в нижнем регистре (и для кириллицы).
+        """
+        if connections[self.db].vendor != 'postgresql':
+            term = term.lower()
+            return self.alias(
+                search_name=UnicodeLower('name'),
+                search_text=UnicodeLower('text'),
+            ).filter(
+                Q(search_name__contains=term) | Q(search_text__contains=term))
+        query = SearchQuery(
+            term, config=SEARCH_CONFIG, search_type='websearch')
+        return self.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-id')
+
+    def latest_by_author(self, author_ids, limit):
+        """Последние limit рецептов каждого автора одним оконным запросом."""
+        recipes_by_author = {author_id: [] for author_id in author_ids}
+        if not author_ids or limit <= 0:
+            return recipes_by_author
+        ranked = self.filter(author_id__in=author_ids).annotate(
+            recipe_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=F('id').desc(),
+            )
+        ).order_by().values(
+            'id', 'author_id', 'name', 'image', 'image_variants',
+            'cooking_time', 'recipe_rank'
+        )
+        sql, params = ranked.query.sql_with_params()
+        recipes = self.model.objects.db_manager(self.db).raw(
+            f'SELECT * FROM ({sql}) ranked '
+            'WHERE ranked.recipe_rank <= %s ORDER BY ranked.id DESC',
+            (*params, limit),
+        )
+        for recipe in recipes:
+            recipes_by_author[recipe.author_id].append(recipe)
+        return recipes_by_author
+
+
 class Recipe(models.Model):
     """Модель рецептов."""
     author = models.ForeignKey(
@@ -67,7 +180,8 @@ class Recipe(models.Model):
     )
     name = models.CharField(
         'Название рецепта',
-        max_length=199
+        max_length=199,
+        db_index=True
     )
     image = models.ImageField(
         'Изображение рецепта',
@@ -75,6 +189,17 @@ class Recipe(models.Model):
         blank=True,
         null=True
     )
+    image_variants = models.JSONField(
+        'Варианты изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
     text = models.TextField(
         'Описание рецепта',
         max_length=1000
@@ -107,11 +232,32 @@ class Recipe(models.Model):
         blank=True,
         null=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Количество в избранном',
+        default=0
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Количество в корзинах',
+        default=0
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_feed_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_feed_idx'),
+        ]
 
     def __str__(self):
         author_name = self.author.username if self.author else "Unknown Author"
@@ -222,6 +368,116 @@ class ShoppingCart(models.Model):
         return f"{self.user} -> {self.recipe}"
 
 
+class ShoppingCartIngredientQuerySet(models.QuerySet):
+    """Кверисет сводного списка покупок."""
+
+    def apply_deltas(self, user_ids, deltas):
+        """Меняет суммы ингредиентов пользователей на deltas.
+
+        Вызывается внутри транзакции: строки пользователей блокируются,
+        чтобы параллельные изменения одной корзины шли последовательно.
+        """
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta
+        }
+        user_ids = sorted(set(user_ids))
+        if not user_ids or not deltas:
+            return
+        list(User.objects.select_for_update().filter(
+            pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+        existing = {
+            (row.user_id, row.ingredient_id): row
+            for row in self.filter(
+                user_id__in=user_ids, ingredient_id__in=deltas)
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, delta in deltas.items():
+                row = existing.get((user_id, ingredient_id))
+                if row is None:
+                    if delta > 0:
+                        to_create.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total_amount=delta,
+                        ))
+                    continue
+                row.total_amount += delta
+                if row.total_amount > 0:
+                    to_update.append(row)
+                else:
+                    to_delete.append(row.pk)
+        self.bulk_create(to_create)
+        self.bulk_update(to_update, ['total_amount'])
+        self.filter(pk__in=to_delete).delete()
+
+    def add_recipe(self, user, recipe, sign=1):
+        """Учитывает рецепт, добавленный в корзину пользователя."""
+        deltas = {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in RecipeIngredient.objects.filter(
+                recipe=recipe).values_list('ingredient_id', 'amount')
+        }
+        self.apply_deltas([user.pk], deltas)
+
+    def remove_recipe(self, user, recipe):
+        """Учитывает рецепт, удалённый из корзины пользователя."""
+        self.add_recipe(user, recipe, sign=-1)
+
+    def apply_recipe_change(self, recipe, deltas):
+        """Переносит изменение ингредиентов рецепта во все корзины с ним."""
+        user_ids = ShoppingCart.objects.filter(
+            recipe=recipe).values_list('user_id', flat=True)
+        self.apply_deltas(user_ids, deltas)
+
+    def expected_totals(self, user_ids=None):
+        """Суммы, посчитанные заново по корзинам и рецептам."""
+        lookup = {'recipe__shopping_cart__isnull': False}
+        if user_ids is not None:
+            lookup = {'recipe__shopping_cart__user_id__in': user_ids}
+        ingredients = RecipeIngredient.objects.filter(**lookup)
+        return {
+            (row['recipe__shopping_cart__user_id'], row['ingredient_id']):
+                row['total_amount']
+            for row in ingredients.values(
+                'recipe__shopping_cart__user_id', 'ingredient_id'
+            ).annotate(total_amount=Sum('amount')).order_by()
+        }
+
+
+class ShoppingCartIngredient(models.Model):
+    """Сводный список покупок: сумма ингредиента в корзине пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_totals',
+        verbose_name='Ингредиент',
+    )
+    total_amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingCartIngredientQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} x {self.total_amount} у {self.user}'
+
+
 class FavoriteRecipe(models.Model):
     """Модель избранного."""
     user = models.ForeignKey(
@@ -250,3 +506,35 @@ class FavoriteRecipe(models.Model):
 
     def __str__(self):
         return f'Избранный {self.recipe} у {self.user}'
+
+
+class ShortLink(models.Model):
+    """Короткая ссылка на рецепт."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='short_link',
+        verbose_name='Рецепт'
+    )
+    code = models.CharField(
+        'Код',
+        max_length=16,
+        unique=True
+    )
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+
+    def __str__(self):
+        return f'{self.code} -> {self.recipe_id}'
+
+    @staticmethod
+    def code_for(recipe_id):
+        """Код в base62, однозначно выводимый из id рецепта."""
+        code = ''
+        while True:
+            recipe_id, remainder = divmod(recipe_id, len(BASE62_ALPHABET))
+            code = BASE62_ALPHABET[remainder] + code
+            if not recipe_id:
+                return code
@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from backend.constants import (INGREDIENTS_VERSION_KEY, SHORT_LINK_CODE_KEY,
+                               SHORT_LINK_RECIPE_KEY, TAGS_VERSION_KEY)
+from backend.images import needs_variants, process_recipe_image
+from backend.response_cache import bump_response_generation
+from backend.versions import bump_version_on_commit
+from jobs.queue import enqueue
+from .models import Ingredient, Recipe, RecipeIngredient, ShortLink, Tag
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    bump_version_on_commit(INGREDIENTS_VERSION_KEY)
+    bump_response_generation()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(sender, **kwargs):
+    bump_version_on_commit(TAGS_VERSION_KEY)
+    bump_response_generation()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, **kwargs):
+    bump_response_generation()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, raw=False, **kwargs):
+    if not raw and needs_variants(instance.image, instance.image_variants):
+        enqueue(process_recipe_image, instance.id, instance.image.name)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        updated_at=timezone.now())
+    bump_response_generation()
+
+
+@receiver(post_delete, sender=ShortLink)
+def short_link_deleted(sender, instance, **kwargs):
+    cache.delete_many([
+        SHORT_LINK_RECIPE_KEY.format(instance.recipe_id),
+        SHORT_LINK_CODE_KEY.format(instance.code),
+    ])
+
+
+def unicode_lower(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+@receiver(connection_created)
+def register_sqlite_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'UNICODE_LOWER', 1, unicode_lower)
@@ -1,17 +1,23 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from backend.pagination import EstimatedCountPaginator
 from .models import User
 
 
 @admin.register(User)
 class UserAdmin(UserAdmin):
     """Админка для пользователей."""
-    list_filter = ('email', 'first_name')
+    list_filter = ('is_staff', 'is_active')
     list_display = (
         'email',
         'first_name',
         'last_name',
         'id',
         'username',
+        'recipes_count',
+        'followers_count',
     )
+    search_fields = ('email__startswith', 'username__startswith')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
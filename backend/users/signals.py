@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from backend.authentication import forget_tokens, forget_user_tokens
+from backend.constants import USER_PROFILE_VERSION_KEY
+from backend.images import needs_variants, process_avatar
+from backend.response_cache import bump_response_generation
+from backend.versions import bump_version_on_commit
+from jobs.queue import enqueue
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def profile_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    bump_version_on_commit(USER_PROFILE_VERSION_KEY.format(instance.id))
+    bump_response_generation()
+
+
+@receiver(post_save, sender=User)
+def avatar_saved(sender, instance, raw=False, **kwargs):
+    if not raw and needs_variants(instance.avatar, instance.avatar_variants):
+        enqueue(process_avatar, instance.id, instance.avatar.name)
+
+
+@receiver(post_save, sender=User)
+def user_tokens_changed(sender, instance, update_fields=None, raw=False,
+                        **kwargs):
+    # Пароль, is_active и профиль в кешированном пользователе устаревают.
+    if raw or update_fields and set(update_fields) == {'last_login'}:
+        return
+    forget_user_tokens(instance.id)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_tokens(instance.key)